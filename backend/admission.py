@@ -0,0 +1,149 @@
+import os
+import re
+import heapq
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+
+import metrics
+from redflags import match_red_flags
+
+# Admission control in front of the triage model. At most
+# LLM_MAX_CONCURRENCY model calls run at once; the rest wait in a priority
+# queue, most urgent first (FIFO within a priority). The queue holds at most
+# LLM_QUEUE_MAX requests: when it is full a new request displaces the newest
+# waiter of a lower priority or is shed with a 503 itself. Critical requests
+# are never shed, and routine ones also give up after LLM_ROUTINE_MAX_WAIT_S.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "200"))
+LLM_ROUTINE_MAX_WAIT_S = float(os.getenv("LLM_ROUTINE_MAX_WAIT_S", "10"))
+
+CRITICAL, URGENT, ROUTINE = 0, 1, 2
+PRIORITY_NAMES = {CRITICAL: "critical", URGENT: "urgent", ROUTINE: "routine"}
+
+# Worrying but not lexicon-level red flags; matched as whole words
+_URGENT_RE = re.compile(
+    r"\b(severe|sudden(ly)?|chest pain|short(ness)? of breath|breathing|bleeding|blood|faint(ed|ing)?|"
+    r"confus(ed|ion)|high fever|vomiting|dizzy|dizziness|numb(ness)?|swelling|pregnan(t|cy)|infant|baby)\b"
+)
+
+WAIT_SECONDS = metrics.Histogram("medassist_llm_queue_wait_seconds", "Time triage requests waited for a model slot",
+                                 ("priority",))
+QUEUE_DEPTH = metrics.Gauge("medassist_llm_queue_depth", "Triage requests waiting for a model slot", ("priority",))
+SHED = metrics.Counter("medassist_llm_shed_total", "Triage requests rejected by admission control",
+                       ("priority", "reason"))
+
+class AdmissionRejected(RuntimeError):
+    pass
+
+def priority_for(symptoms: str) -> int:
+    """Cheap pre-score of the symptom text: lexicon red flags, then urgent terms"""
+    if match_red_flags(symptoms or ""):
+        return CRITICAL
+    if _URGENT_RE.search(" ".join((symptoms or "").lower().split())):
+        return URGENT
+    return ROUTINE
+
+class AdmissionQueue:
+    """Bounded pool of model slots handed out in priority order"""
+
+    def __init__(self, name: str, concurrency: int, queue_max: int, routine_max_wait_s: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_max = queue_max
+        self.routine_max_wait_s = routine_max_wait_s
+        self.active = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+        self._seq = itertools.count()
+        # (priority, seq, future); cancelled or displaced entries are skipped on pop
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._depth = {p: 0 for p in PRIORITY_NAMES}
+
+    def _shed(self, priority: int, reason: str) -> AdmissionRejected:
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        SHED.inc(priority=PRIORITY_NAMES[priority], reason=reason)
+        return AdmissionRejected(f"Triage is overloaded ({reason}); try again shortly")
+
+    def _queued(self, priority: int, delta: int) -> None:
+        self._depth[priority] += delta
+        QUEUE_DEPTH.set(self._depth[priority], priority=PRIORITY_NAMES[priority])
+
+    def _displace(self, priority: int) -> bool:
+        """Shed the newest waiter of lower priority than `priority`; False if there is none"""
+        live = [e for e in self._heap if not e[2].done() and e[0] > priority]
+        if not live:
+            return False
+        victim = max(live, key=lambda e: (e[0], e[1]))
+        victim[2].set_exception(self._shed(victim[0], "displaced"))
+        self._queued(victim[0], -1)
+        return True
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < self.concurrency and not any(self._depth.values()):
+            self.active += 1
+            self.admitted += 1
+            WAIT_SECONDS.observe(0, priority=PRIORITY_NAMES[priority])
+            return
+        full = sum(self._depth.values()) >= self.queue_max
+        if full and not self._displace(priority) and priority != CRITICAL:
+            raise self._shed(priority, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), future))
+        self._queued(priority, 1)
+        start = time.perf_counter()
+        timeout = self.routine_max_wait_s if priority == ROUTINE else None
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self._queued(priority, -1)
+                raise self._shed(priority, "wait_timeout")
+            # granted just as the wait timed out: take the slot
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()  # the slot was handed to us; pass it on
+            elif not future.done():
+                future.cancel()
+                self._queued(priority, -1)
+            raise
+        if future.exception() is not None:
+            raise future.exception()
+        self.admitted += 1
+        WAIT_SECONDS.observe(time.perf_counter() - start, priority=PRIORITY_NAMES[priority])
+
+    def release(self) -> None:
+        # hand the slot straight to the most urgent live waiter
+        while self._heap:
+            priority, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue
+            self._queued(priority, -1)
+            future.set_result(None)
+            return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued": {PRIORITY_NAMES[p]: n for p, n in self._depth.items()},
+            "queue_max": self.queue_max,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
+
+llm_admission = AdmissionQueue("llm", LLM_MAX_CONCURRENCY, LLM_QUEUE_MAX, LLM_ROUTINE_MAX_WAIT_S)
@@ -0,0 +1,190 @@
+"""Local stand-ins for the OpenAI, Places and OpenWeather APIs used by the load benchmark.
+
+    cd backend && python -m benchmarks.fake_upstreams --port 8900 [--profile profile.json]
+
+Point the backend at it with
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+    PLACES_URL=http://127.0.0.1:8900/places/nearbysearch/json
+    OW_URL=http://127.0.0.1:8900/weather
+
+Each upstream's latency is log-normal around `latency_s` (sigma `jitter`) and
+a fraction `error_rate` of calls fail with `error_status`. A profile file
+overrides any of the DEFAULT_PROFILE values, e.g. {"llm": {"error_rate": 0.05}}.
+Places returns `results` hospitals per search, or `density_per_km2` times the
+search area (capped at 60, as Places does), in pages of `page_size`.
+"""
+import sys
+import json
+import math
+import time
+import zlib
+import random
+import asyncio
+import argparse
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+DEFAULT_PROFILE = {
+    "llm": {"latency_s": 0.8, "jitter": 0.35, "error_rate": 0.0, "error_status": 500, "token_delay_s": 0.01},
+    "tts": {"latency_s": 0.3, "jitter": 0.3, "error_rate": 0.0, "error_status": 500, "bytes_per_char": 120},
+    "places": {"latency_s": 0.15, "jitter": 0.3, "error_rate": 0.0, "error_status": 500, "results": 12,
+               "density_per_km2": None, "page_size": 20},
+    "weather": {"latency_s": 0.08, "jitter": 0.3, "error_rate": 0.0, "error_status": 500},
+}
+
+ASSESSMENTS = [
+    {
+        "condition_type": "respiratory", "severity": "moderate", "confidence": 0.72,
+        "red_flags": [], "recommended_actions": ["Rest and drink fluids", "See a doctor if breathing gets worse"],
+        "self_care_advice": "Use a humidifier and avoid smoke.",
+    },
+    {
+        "condition_type": "cardiac", "severity": "critical", "confidence": 0.86,
+        "red_flags": ["chest pain radiating to the arm"],
+        "recommended_actions": ["Call emergency services now", "Chew an aspirin unless allergic"],
+        "self_care_advice": None,
+    },
+    {
+        "condition_type": "gastrointestinal", "severity": "low", "confidence": 0.64,
+        "red_flags": [], "recommended_actions": ["Sip clear fluids", "Eat bland food for a day"],
+        "self_care_advice": "Oral rehydration salts help with fluid loss.",
+    },
+]
+
+def merge_profile(overrides: Optional[Dict]) -> Dict:
+    profile = {name: dict(values) for name, values in DEFAULT_PROFILE.items()}
+    for name, values in (overrides or {}).items():
+        profile.setdefault(name, {}).update(values)
+    return profile
+
+def build_app(profile: Dict, seed: Optional[int] = None) -> FastAPI:
+    rng = random.Random(seed)
+    app = FastAPI(title="Fake upstreams")
+    app.state.calls = {name: 0 for name in profile}
+
+    async def delay(name: str) -> Optional[Response]:
+        """Sleep for one sampled latency; returns an error response for failed calls"""
+        p = profile[name]
+        app.state.calls[name] += 1
+        await asyncio.sleep(p["latency_s"] * math.exp(rng.gauss(0, p["jitter"])))
+        if rng.random() < p["error_rate"]:
+            return JSONResponse({"error": {"message": f"injected {name} failure", "type": "server_error"}},
+                                status_code=p["error_status"])
+        return None
+
+    @app.get("/calls")
+    def calls():
+        return app.state.calls
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        error = await delay("llm")
+        if error is not None:
+            return error
+        prompt = json.dumps(body.get("messages", []))
+        content = json.dumps(ASSESSMENTS[zlib.crc32(prompt.encode()) % len(ASSESSMENTS)])
+        model = body.get("model", "gpt-4o-mini")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4},
+            }
+
+        async def events():
+            def chunk(delta, finish=None):
+                data = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+                return f"data: {json.dumps(data)}\n\n"
+            yield chunk({"role": "assistant", "content": ""})
+            for i in range(0, len(content), 4):  # ~one token per 4 characters
+                await asyncio.sleep(profile["llm"]["token_delay_s"])
+                yield chunk({"content": content[i:i + 4]})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        body = await request.json()
+        error = await delay("tts")
+        if error is not None:
+            return error
+        size = max(len(body.get("input", "")), 1) * profile["tts"]["bytes_per_char"]
+        frame = b"\xff\xfb\x90\x64" + b"\x00" * 413  # one silent 128 kbps MPEG frame
+        audio = frame * (size // len(frame) + 1)
+        return Response(audio[:size], media_type="audio/mpeg")
+
+    @app.get("/places/nearbysearch/json")
+    async def places(location: str = "", radius: int = 5000, pagetoken: Optional[str] = None):
+        error = await delay("places")
+        if error is not None:
+            return error
+        p = profile["places"]
+        if pagetoken:
+            location, radius, offset = pagetoken.split("|")
+            radius, offset = int(radius), int(offset)
+        else:
+            offset = 0
+        lat, lon = (float(v) for v in location.split(","))
+        spread = radius / 111_000
+        total = p["results"]
+        if p.get("density_per_km2") is not None:
+            total = min(int(p["density_per_km2"] * math.pi * (radius / 1000) ** 2), 60)
+        end = min(offset + p["page_size"], total)
+        results = []
+        for n in range(offset, end):
+            results.append({
+                "name": f"Fake Hospital {n}",
+                "vicinity": f"{n} Bench Street",
+                "rating": round(rng.uniform(3, 5), 1),
+                "user_ratings_total": rng.randint(5, 500),
+                "geometry": {"location": {"lat": lat + rng.uniform(-spread, spread) * 0.7,
+                                          "lng": lon + rng.uniform(-spread, spread) * 0.7}},
+                "place_id": f"fake-{lat:.3f}-{lon:.3f}-{n}",
+                "opening_hours": {"open_now": True},
+            })
+        body = {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+        if end < total:
+            body["next_page_token"] = f"{location}|{radius}|{end}"
+        return body
+
+    @app.get("/weather")
+    async def weather(lat: float, lon: float):
+        error = await delay("weather")
+        if error is not None:
+            return error
+        return {
+            "weather": [{"main": "Clouds", "description": "scattered clouds"}],
+            "main": {"temp": 24.5, "feels_like": 25.1, "humidity": 61},
+            "wind": {"speed": 3.2},
+            "coord": {"lat": lat, "lon": lon},
+        }
+
+    return app
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--profile", help="JSON file overriding DEFAULT_PROFILE")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    overrides = None
+    if args.profile:
+        with open(args.profile) as f:
+            overrides = json.load(f)
+
+    import uvicorn
+    uvicorn.run(build_app(merge_profile(overrides), args.seed), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
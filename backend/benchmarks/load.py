@@ -0,0 +1,278 @@
+"""Load benchmark: drive the backend at a fixed request rate against fake upstreams.
+
+    cd backend && python -m benchmarks.load [--endpoints analyze,assist,hospitals,tts]
+                                            [--rate 20] [--duration 30] [--profile profile.json]
+
+Starts benchmarks.fake_upstreams and the app (uvicorn main:app) as
+subprocesses, points the app at the fakes through OPENAI_BASE_URL, PLACES_URL
+and OW_URL, then runs each endpoint in turn. Requests are sent open-loop:
+one is started every 1/rate seconds whether or not earlier ones have
+finished, so queueing in the app shows up in the latencies. Throughput and
+p50/p95/p99 latencies per endpoint are printed and written as JSON (with the
+run's config, the upstream profile and the app's /stats) for comparing runs.
+Use --base-url to benchmark an app that is already running instead.
+"""
+import os
+import sys
+import json
+import math
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_upstreams import merge_profile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+SYMPTOMS = [
+    "dry cough and mild fever for three days",
+    "sudden chest pain spreading to my left arm",
+    "stomach cramps and diarrhea since last night",
+    "itchy rash on both arms after gardening",
+    "headache and sensitivity to light",
+    "twisted ankle, swollen and painful to walk on",
+    "sore throat and runny nose",
+    "shortness of breath when climbing stairs",
+]
+TTS_TEXT = (
+    "**Assessment:** Respiratory, moderate severity.\n"
+    "- Rest and drink plenty of fluids.\n"
+    "- See a doctor if breathing gets worse or the fever lasts more than three days.\n"
+)
+# Spread of request locations around this point, one per distinct payload
+BASE_LAT, BASE_LON = 33.6844, 73.0479
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = math.ceil(q / 100 * len(sorted_values))  # nearest rank
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+def build_request(endpoint: str, n: int, distinct: int, bypass_cache: bool) -> Dict:
+    """Path and JSON body for the n-th request; `distinct` payloads repeat round-robin"""
+    i = n % distinct
+    symptoms = SYMPTOMS[i % len(SYMPTOMS)]
+    if i >= len(SYMPTOMS):
+        symptoms += f" (case {i})"
+    user = {
+        "age": 20 + i % 50,
+        "gender": ("male", "female")[i % 2],
+        "latitude": BASE_LAT + (i % 20) * 0.05,
+        "longitude": BASE_LON + (i // 20) * 0.05,
+        "city": "Islamabad",
+        "country": "Pakistan",
+    }
+    if endpoint == "tts":
+        return {"path": "/tts", "json": {"text": f"{TTS_TEXT}Case {i}.", "voice": "alloy"}}
+    return {"path": f"/{endpoint}", "json": {"symptoms": symptoms, "user": user, "bypass_cache": bypass_cache}}
+
+async def _timed(client: httpx.AsyncClient, request: Dict, samples: List, sem: asyncio.Semaphore):
+    start = time.perf_counter()
+    try:
+        async with client.stream("POST", request["path"], json=request["json"]) as r:
+            async for _ in r.aiter_bytes():
+                pass
+            status = r.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    finally:
+        sem.release()
+    samples.append((time.perf_counter() - start, status))
+
+async def run_endpoint(client: httpx.AsyncClient, endpoint: str, rate: float, duration: float,
+                       distinct: int, bypass_cache: bool, max_in_flight: int) -> Dict:
+    samples: List = []
+    tasks = []
+    dropped = 0
+    sem = asyncio.Semaphore(max_in_flight)
+    total = int(rate * duration)
+    start = time.perf_counter()
+    for n in range(total):
+        # open loop: keep to the schedule instead of waiting for responses
+        delay = start + n / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if sem.locked():
+            dropped += 1  # client-side cap reached; counted instead of silently slowing the schedule
+            continue
+        await sem.acquire()
+        request = build_request(endpoint, n, distinct, bypass_cache)
+        tasks.append(asyncio.create_task(_timed(client, request, samples, sem)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(s for s, status in samples if status == 200)
+    statuses: Dict[str, int] = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "target_rps": rate,
+        "sent": len(samples),
+        "dropped": dropped,
+        "ok": len(latencies),
+        "errors": len(samples) - len(latencies),
+        "status_counts": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": _ms(_percentile(latencies, 50)),
+            "p95": _ms(_percentile(latencies, 95)),
+            "p99": _ms(_percentile(latencies, 99)),
+            "mean": _ms(sum(latencies) / len(latencies) if latencies else None),
+            "max": _ms(latencies[-1] if latencies else None),
+        },
+    }
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+async def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {proc.returncode}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+def _start(args: List[str], env: Dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env)
+
+def _stop(proc: Optional[subprocess.Popen]):
+    if proc is not None and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> Dict:
+    overrides = None
+    if args.profile:
+        with open(args.profile) as f:
+            overrides = json.load(f)
+    profile = merge_profile(overrides)
+
+    fake = app = None
+    base_url = args.base_url
+    tmp = tempfile.TemporaryDirectory(prefix="med-assist-bench-")
+    try:
+        if base_url is None:
+            fake_port, app_port = _free_port(), _free_port()
+            profile_path = os.path.join(tmp.name, "profile.json")
+            with open(profile_path, "w") as f:
+                json.dump(profile, f)
+            fake_url = f"http://127.0.0.1:{fake_port}"
+            fake = _start(["-m", "benchmarks.fake_upstreams", "--port", str(fake_port),
+                           "--profile", profile_path, "--seed", str(args.seed)], dict(os.environ))
+            await _wait_ready(f"{fake_url}/calls", fake)
+
+            env = dict(os.environ)
+            env.update({
+                "OPENAI_API_KEY": "bench",
+                "OPENAI_BASE_URL": f"{fake_url}/v1",
+                "GOOGLE_MAPS_API_KEY": "bench",
+                "PLACES_URL": f"{fake_url}/places/nearbysearch/json",
+                "OPENWEATHER_API_KEY": "bench",
+                "OW_URL": f"{fake_url}/weather",
+                "HOSPITAL_PROVIDER": "google",
+                "TTS_CACHE_DIR": os.path.join(tmp.name, "tts"),
+            })
+            base_url = f"http://127.0.0.1:{app_port}"
+            app = _start(["-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning"], env)
+            await _wait_ready(f"{base_url}/health", app)
+
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        results = {}
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            for endpoint in args.endpoints:
+                if args.warmup:
+                    await run_endpoint(client, endpoint, args.rate, args.warmup, args.distinct,
+                                       args.bypass_cache, args.max_in_flight)
+                results[endpoint] = await run_endpoint(client, endpoint, args.rate, args.duration, args.distinct,
+                                                       args.bypass_cache, args.max_in_flight)
+                _print_result(endpoint, results[endpoint])
+            app_stats = (await client.get("/stats")).json()
+    finally:
+        _stop(app)
+        _stop(fake)
+        tmp.cleanup()
+
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": _git_rev(),
+        "config": {
+            "endpoints": args.endpoints,
+            "rate": args.rate,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "distinct": args.distinct,
+            "bypass_cache": args.bypass_cache,
+            "max_in_flight": args.max_in_flight,
+            "seed": args.seed,
+            "base_url": args.base_url,
+        },
+        "profile": profile if args.base_url is None else None,
+        "results": results,
+        "app_stats": app_stats,
+    }
+
+def _print_result(endpoint: str, r: Dict):
+    lat = r["latency_ms"]
+    print(f"{endpoint:>10}: {r['throughput_rps']:7.2f} rps  ok {r['ok']}/{r['sent']}  "
+          f"p50 {lat['p50']} ms  p95 {lat['p95']} ms  p99 {lat['p99']} ms"
+          + (f"  dropped {r['dropped']}" if r["dropped"] else ""))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default="analyze,assist,hospitals,tts",
+                        type=lambda s: [e.strip() for e in s.split(",") if e.strip()])
+    parser.add_argument("--rate", type=float, default=20, help="requests per second per endpoint")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=0, help="unrecorded seconds before each endpoint")
+    parser.add_argument("--distinct", type=int, default=50, help="distinct payloads (lower = more cache hits)")
+    parser.add_argument("--bypass-cache", action="store_true", help="set bypass_cache on triage requests")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="client-side cap on outstanding requests")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--profile", help="JSON file overriding the fake upstreams' DEFAULT_PROFILE")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the fake upstreams' latency sampling")
+    parser.add_argument("--base-url", help="benchmark an already running app instead of starting one")
+    parser.add_argument("--json", help="result file (default: benchmarks/results/load-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+
+    path = args.json
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, time.strftime("load-%Y%m%d-%H%M%S.json"))
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Microbenchmark for tools.tts.clean_text_for_tts.
+
+Checks the current normalizer against the golden corpus (outputs recorded
+from the original implementation) and against a randomized corpus, then
+times both implementations on the realistic assessment texts.
+
+    cd backend && python -m benchmarks.tts_normalizer [--number N] [--json out.json]
+"""
+import os
+import re
+import sys
+import json
+import random
+import timeit
+import argparse
+
+from tools.tts import clean_text_for_tts
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "tts_corpus.json")
+
+# Original implementation, kept verbatim as the reference
+def legacy_clean_text_for_tts(text: str) -> str:
+    """Clean text for better TTS pronunciation"""
+    # Remove markdown formatting
+    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Remove **bold**
+    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Remove *italic*
+    text = re.sub(r'#{1,6}\s*', '', text)         # Remove headers
+    text = re.sub(r'[•▪▫‣⁃]', ' ', text)          # Convert bullets to spaces
+    text = re.sub(r'\n+', '. ', text)             # Replace newlines with periods
+    text = re.sub(r'\s+', ' ', text)              # Normalize whitespace
+    
+    # Replace symbols and emojis for better pronunciation
+    replacements = {
+        '🚨': 'Alert: ',
+        '🏥': 'Medical: ',
+        '📞': 'Contact: ',
+        '⚠️': 'Warning: ',
+        '🔍': 'Analysis: ',
+        '👁️': 'Watch for: ',
+        '🚫': 'Do not: ',
+        '⏱️': 'Time: ',
+        '🩹': 'Self-care: ',
+        '🌡️': 'Weather: ',
+        '📍': 'Location: ',
+        '🗺️': 'Maps: ',
+        '💡': 'Note: ',
+        '⚕️': 'Medical: ',
+        'N/A': 'not available',
+        '★': ' stars',
+        '%': ' percent',
+        'Dr.': 'Doctor',
+        'St.': 'Street',
+        'Ave.': 'Avenue',
+        'Rd.': 'Road',
+        'vs.': 'versus',
+        'etc.': 'etcetera',
+        '°C': ' degrees Celsius',
+        '°F': ' degrees Fahrenheit'
+    }
+    
+    for symbol, replacement in replacements.items():
+        text = text.replace(symbol, replacement)
+    
+    # Remove URLs and markdown links
+    text = re.sub(r'https?://[^\s]+', 'web link', text)
+    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+    
+    return text.strip()
+
+# Fragments that exercise pass interactions (nested emphasis, bullets next to
+# newlines, replacements that create new symbols, URLs containing '%', ...)
+_FRAGMENTS = [
+    "*", "**", "#", "## ", "\n", "\n\n", " ", "  ", "\t", "\r\n", " ", "•", "▪", "‣",
+    "N/", "A", "tc.", "N/A", "🔍", "🚨", "⚠️", "⚠", "️", "%", "°", "C", "F", "Dr.", "St.",
+    "Ave.", "vs.", "etc.", "★", "https://x.io/a%20b", "[link](http://y)", "[", "]", "(", ")",
+    "word", "Chest pain.", "e.",
+]
+
+def load_corpus(path: str = CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def random_corpus(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(_FRAGMENTS) for _ in range(rng.randint(1, 12))) for _ in range(n)]
+
+def check(corpus, fuzz: int = 20000) -> int:
+    failures = 0
+    for case in corpus:
+        got = clean_text_for_tts(case["input"])
+        if got != case["expected"]:
+            failures += 1
+            print(f"golden mismatch ({case['name']}): {got!r} != {case['expected']!r}")
+    for text in random_corpus(fuzz):
+        expected = legacy_clean_text_for_tts(text)
+        if clean_text_for_tts(text) != expected:
+            failures += 1
+            print(f"fuzz mismatch: {text!r}")
+    return failures
+
+def bench(texts, number: int) -> dict:
+    results = {}
+    for name, fn in (("legacy", legacy_clean_text_for_tts), ("current", clean_text_for_tts)):
+        seconds = min(timeit.repeat(lambda: [fn(t) for t in texts], number=number, repeat=5))
+        results[name] = {"us_per_call": round(seconds / number / len(texts) * 1e6, 2)}
+    results["speedup"] = round(results["legacy"]["us_per_call"] / results["current"]["us_per_call"], 2)
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="timing loops per repeat")
+    parser.add_argument("--fuzz", type=int, default=20000, help="randomized equivalence cases")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    failures = check(corpus, args.fuzz)
+    if failures:
+        print(f"❌ {failures} mismatches against the reference implementation")
+        return 1
+    print(f"✅ {len(corpus)} golden cases and {args.fuzz} randomized cases match")
+
+    texts = [c["input"] for c in corpus if c["name"].startswith("assessment")]
+    results = bench(texts, args.number)
+    results["texts"] = len(texts)
+    results["avg_chars"] = sum(map(len, texts)) // len(texts)
+    print(f"legacy : {results['legacy']['us_per_call']:8.2f} us/call")
+    print(f"current: {results['current']['us_per_call']:8.2f} us/call  ({results['speedup']}x)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
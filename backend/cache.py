@@ -0,0 +1,255 @@
+import os
+import time
+import asyncio
+import stat
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+def private_dir(name: str) -> str:
+    """<tmp>/<name>-<uid>, created with mode 0700 and shared by this user's workers.
+
+    Falls back to a fresh per-process directory if the shared one exists but
+    is not a directory owned by us that only we can access.
+    """
+    path = os.path.join(tempfile.gettempdir(), f"{name}-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077:
+        return path
+    log.warning("%s is not a private directory; using a per-process one", path)
+    return tempfile.mkdtemp(prefix=f"{name}-")
+
+# Backend for caches created with make_cache(): "memory" (per process) or
+# "sqlite", a WAL-mode database file shared by every worker on the host, so
+# adding workers does not split the cache.
+CACHE_BACKEND = (os.getenv("CACHE_BACKEND") or "memory").lower()
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH") or os.path.join(private_dir("med-assist"), "cache.sqlite3")
+
+_MISSING = object()
+
+class _AsyncCache:
+    """aget/aset for async callers; backends doing I/O run the sync method in a thread"""
+    blocking = False
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args) if self.blocking else fn(*args)
+
+    async def aget_with_age(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        return await self._call(self.get_with_age, key)
+
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        found = await self.aget_with_age(key)
+        return default if found is None else found[0]
+
+    async def aset(self, key: Hashable, value: Any) -> None:
+        await self._call(self.set, key, value)
+
+class TTLCache(_AsyncCache):
+    """Bounded in-process cache with per-entry TTL and LRU eviction"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_with_age(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return (value, age_seconds) for a live entry, or None; counts a hit or miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            age = now - stored_at
+            if age > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, age
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found = self.get_with_age(key)
+        return default if found is None else found[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class SQLiteCache(_AsyncCache):
+    """TTLCache with the same TTL/LRU semantics, stored in a SQLite file shared across processes.
+
+    Values are stored as JSON (tuples come back as lists) and keys by repr(),
+    so keys must be tuples of plain values. Hit/miss counters are per process; size is shared. Entries
+    over maxsize are evicted in small batches (every EVICT_EVERY writes).
+    A hit only rewrites used_at once it is older than TOUCH_FRACTION of the
+    TTL, so hot reads don't contend for the write lock. Async callers use
+    aget/aset, which keep the database calls off the event loop.
+    """
+    EVICT_EVERY = 32
+    TOUCH_FRACTION = 0.1
+    blocking = True
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0, path: str = CACHE_SQLITE_PATH):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._size = 0  # as of the last eviction pass; stats() doesn't query
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        # one connection per process; reopened after a fork
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_json ("
+                " cache TEXT NOT NULL, key TEXT NOT NULL, stored_at REAL NOT NULL,"
+                " used_at REAL NOT NULL, value TEXT NOT NULL, PRIMARY KEY (cache, key)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_json_lru ON cache_json (cache, used_at)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get_with_age(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return (value, age_seconds) for a live entry, or None; counts a hit or miss"""
+        now = time.time()
+        k = repr(key)
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT stored_at, used_at, value FROM cache_json WHERE cache = ? AND key = ?", (self.name, k)
+            ).fetchone()
+            if row is None or now - row[0] > self.ttl:
+                if row is not None:
+                    db.execute("DELETE FROM cache_json WHERE cache = ? AND key = ?", (self.name, k))
+                self.misses += 1
+                return None
+            if now - row[1] > self.ttl * self.TOUCH_FRACTION:
+                db.execute("UPDATE cache_json SET used_at = ? WHERE cache = ? AND key = ?", (now, self.name, k))
+            self.hits += 1
+        return json.loads(row[2]), now - row[0]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found = self.get_with_age(key)
+        return default if found is None else found[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = time.time()
+        text = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO cache_json (cache, key, stored_at, used_at, value) VALUES (?, ?, ?, ?, ?)",
+                (self.name, repr(key), now, now, text),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 1:  # the first write, then every EVICT_EVERY
+                self._evict_locked(db, now)
+
+    def _evict_locked(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM cache_json WHERE cache = ? AND stored_at < ?", (self.name, now - self.ttl))
+        (size,) = db.execute("SELECT COUNT(*) FROM cache_json WHERE cache = ?", (self.name,)).fetchone()
+        if size > self.maxsize:
+            db.execute(
+                "DELETE FROM cache_json WHERE cache = ? AND key IN ("
+                " SELECT key FROM cache_json WHERE cache = ? ORDER BY used_at LIMIT ?)",
+                (self.name, self.name, size - self.maxsize),
+            )
+        self._size = min(size, self.maxsize)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        k = repr(key)
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT value FROM cache_json WHERE cache = ? AND key = ?", (self.name, k)
+            ).fetchone()
+            db.execute("DELETE FROM cache_json WHERE cache = ? AND key = ?", (self.name, k))
+        return default if row is None else json.loads(row[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM cache_json WHERE cache = ?", (self.name,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute(
+                "SELECT COUNT(*) FROM cache_json WHERE cache = ?", (self.name,)
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "backend": "sqlite",
+            "size": self._size,
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+BACKENDS = {
+    "memory": TTLCache,
+    "sqlite": SQLiteCache,
+}
+
+def make_cache(name: str, maxsize: int = 1024, ttl: float = 300.0):
+    """Cache for `name` on the configured CACHE_BACKEND"""
+    backend = BACKENDS.get(CACHE_BACKEND)
+    if backend is None:
+        raise RuntimeError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+    return backend(name, maxsize=maxsize, ttl=ttl)
@@ -0,0 +1,160 @@
+import os
+import time
+import logging
+from collections import deque
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+import metrics
+from chains import TRIAGE_MODELS, build_condition_chain, get_condition_chain
+from models import ConditionAssessment
+from parsing import parse_assessment, AssessmentParseError
+
+log = logging.getLogger(__name__)
+
+# Model cascade for triage: every request starts on the first (cheapest) tier
+# and is escalated to the next when the answer is unsure - confidence below
+# TRIAGE_CONFIDENCE_THRESHOLD, a severity in TRIAGE_BORDERLINE_SEVERITIES, or
+# output that doesn't validate. The last tier's answer is final. With a single
+# tier (the default TRIAGE_MODELS) nothing is ever escalated.
+TRIAGE_CONFIDENCE_THRESHOLD = float(os.getenv("TRIAGE_CONFIDENCE_THRESHOLD", "0.6"))
+TRIAGE_BORDERLINE_SEVERITIES = {
+    s.strip().lower() for s in (os.getenv("TRIAGE_BORDERLINE_SEVERITIES") or "moderate").split(",") if s.strip()
+}
+LATENCY_WINDOW = 500
+
+TIER_SECONDS = metrics.Histogram("medassist_triage_tier_duration_seconds", "Model latency per cascade tier", ("tier",))
+ESCALATIONS = metrics.Counter("medassist_triage_escalations_total", "Requests escalated to the next cascade tier",
+                              ("tier", "reason"))
+
+class Tier:
+    def __init__(self, name: str, chain):
+        self.name = name
+        self.chain = chain
+        self.calls = 0
+        self.errors = 0
+        self.escalated = {}  # reason -> count
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    async def invoke(self, inputs: dict) -> str:
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            with metrics.track("llm"):
+                return await self.chain.ainvoke(inputs)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def observe(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+        TIER_SECONDS.observe(seconds, tier=self.name)
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+    def stats(self) -> dict:
+        escalated = sum(self.escalated.values())
+        p50, p95 = self._percentile(50), self._percentile(95)
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / self.calls, 4) if self.calls else 0.0,
+            "escalation_reasons": dict(self.escalated),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+def escalation_reason(assessment: ConditionAssessment) -> Optional[str]:
+    if assessment.confidence < TRIAGE_CONFIDENCE_THRESHOLD:
+        return "low_confidence"
+    if assessment.severity in TRIAGE_BORDERLINE_SEVERITIES:
+        return "borderline_severity"
+    return None
+
+class TriageCascade:
+    """Runs triage on the tiers in order until one gives a confident answer"""
+
+    def __init__(self, tiers: Sequence[Tuple[str, object]]):
+        if not tiers:
+            raise ValueError("a cascade needs at least one tier")
+        self.tiers: List[Tier] = [Tier(name, chain) for name, chain in tiers]
+
+    @classmethod
+    def from_llms(cls, llms: Sequence[Tuple[str, object]]) -> "TriageCascade":
+        """Cascade over (name, chat model) pairs, e.g. fake chat models in tests"""
+        return cls([(name, build_condition_chain(llm=llm)) for name, llm in llms])
+
+    @property
+    def first(self) -> Tier:
+        return self.tiers[0]
+
+    async def run(self, inputs: dict, parse: Callable[[str], Awaitable[ConditionAssessment]],
+                  first_raw: Optional[str] = None, first_latency_s: Optional[float] = None) -> ConditionAssessment:
+        """Triage `inputs`; `parse` validates the last tier's output (it may re-ask the model).
+
+        Pass `first_raw` (and its latency, if known) when the first tier has
+        already answered - streamed or batched requests - so only escalations
+        are run here.
+        """
+        if first_raw is not None:
+            self.first.calls += 1
+            if first_latency_s is not None:
+                self.first.observe(first_latency_s)
+        best = None  # latest valid answer from a lower tier, used if escalation fails
+        for n, tier in enumerate(self.tiers):
+            last = n == len(self.tiers) - 1
+            try:
+                raw = first_raw if n == 0 and first_raw is not None else await tier.invoke(inputs)
+                if last:
+                    return await parse(raw)
+                assessment = parse_assessment(raw)
+            except AssessmentParseError:
+                reason = "invalid"
+            except Exception:
+                if best is None:
+                    raise
+                log.warning("triage tier %s failed; using the %s answer", tier.name, best[0], exc_info=True)
+                return best[1]
+            else:
+                reason = escalation_reason(assessment)
+                if reason is None:
+                    return assessment
+                best = (tier.name, assessment)
+            tier.escalated[reason] = tier.escalated.get(reason, 0) + 1
+            ESCALATIONS.inc(tier=tier.name, reason=reason)
+
+    def stats(self) -> dict:
+        return {
+            "confidence_threshold": TRIAGE_CONFIDENCE_THRESHOLD,
+            "borderline_severities": sorted(TRIAGE_BORDERLINE_SEVERITIES),
+            "tiers": [t.stats() for t in self.tiers],
+        }
+
+_cascade = None
+
+def get_cascade() -> TriageCascade:
+    """Cascade over TRIAGE_MODELS; builds the chains on first use"""
+    global _cascade
+    if _cascade is None:
+        _cascade = TriageCascade([(model, get_condition_chain(n)) for n, model in enumerate(TRIAGE_MODELS)])
+    return _cascade
+
+def set_cascade(cascade: Optional[TriageCascade]) -> None:
+    """Replace the cascade (None rebuilds it from TRIAGE_MODELS on next use)"""
+    global _cascade
+    _cascade = cascade
+
+def cascade_stats() -> dict:
+    # /stats shouldn't be what builds the chains
+    if _cascade is None:
+        return {"confidence_threshold": TRIAGE_CONFIDENCE_THRESHOLD,
+                "borderline_severities": sorted(TRIAGE_BORDERLINE_SEVERITIES),
+                "tiers": [{"name": m, "calls": 0} for m in TRIAGE_MODELS]}
+    return _cascade.stats()
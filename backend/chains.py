@@ -1,6 +1,11 @@
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema.output_parser import StrOutputParser
+import os
+
+# LangChain is imported inside the builders: it dominates the backend's import
+# time, and main builds the chains on first use (or during warm-up).
+
+# Triage models, cheapest first. With more than one, cascade.py escalates
+# uncertain answers from one tier to the next.
+TRIAGE_MODELS = [m.strip() for m in (os.getenv("TRIAGE_MODELS") or "gpt-4o-mini").split(",") if m.strip()]
 
 SYSTEM_PROMPT = """\
 You are a careful triage assistant. Classify likely medical condition and severity from symptoms.
@@ -21,11 +26,51 @@ Gender: {gender}
 Location: {city}, {country}
 """
 
-def build_condition_chain():
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
+def _imports():
+    from langchain_openai import ChatOpenAI
+    from langchain.prompts import ChatPromptTemplate
+    from langchain.schema.output_parser import StrOutputParser
+    return ChatOpenAI, ChatPromptTemplate, StrOutputParser
+
+def build_condition_chain(model: str = "gpt-4o-mini", llm=None):
+    """Triage chain on `model`, or on `llm` (any LangChain chat model, e.g. a fake one in tests)"""
+    ChatOpenAI, ChatPromptTemplate, StrOutputParser = _imports()
+    llm = llm or ChatOpenAI(model=model, temperature=0.2)
     prompt = ChatPromptTemplate.from_messages([
         ("system", SYSTEM_PROMPT),
         ("user", USER_TEMPLATE),
     ])
     return prompt | llm | StrOutputParser()
 
+
+REPAIR_TEMPLATE = """\
+Your previous reply could not be used: {error}
+Previous reply:
+{raw}
+
+Return only the corrected JSON object, with exactly the keys listed above.
+"""
+
+def build_repair_chain():
+    ChatOpenAI, ChatPromptTemplate, StrOutputParser = _imports()
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("user", REPAIR_TEMPLATE),
+    ])
+    return prompt | llm | StrOutputParser()
+
+_condition_chains = {}
+_repair_chain = None
+
+def get_condition_chain(tier: int = 0):
+    """Chain for TRIAGE_MODELS[tier]; tier 0 is the one every request starts on"""
+    if tier not in _condition_chains:
+        _condition_chains[tier] = build_condition_chain(TRIAGE_MODELS[tier])
+    return _condition_chains[tier]
+
+def get_repair_chain():
+    global _repair_chain
+    if _repair_chain is None:
+        _repair_chain = build_repair_chain()
+    return _repair_chain
@@ -1,17 +1,83 @@
-import os, json
-from fastapi import FastAPI, HTTPException, Response
-from fastapi.middleware.cors import CORSMiddleware
+import startup  # first, so it can time the imports below
 from dotenv import load_dotenv
 
-from models import SymptomInput, ConditionAssessment, TTSRequest
-from chains import build_condition_chain
-from tools.hospitals import nearby_hospitals
-from tools.tts import tts_to_mp3_bytes
-from tools.weather import current_weather
-
+# before the project imports: their settings are read from the environment on import
 load_dotenv()
 
-app = FastAPI(title="Med Assist Backend", version="0.2.0")
+import os, asyncio, time, logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, FileResponse, PlainTextResponse, JSONResponse
+from fastapi.middleware.cors import CORSMiddleware
+
+from models import (
+    SymptomInput, ConditionAssessment, TTSRequest,
+    BatchSymptomInput, BatchItemResult, BatchAssessmentResponse,
+)
+from chains import get_repair_chain
+from cascade import get_cascade, cascade_stats
+from admission import llm_admission, priority_for, AdmissionRejected
+import triage_cache
+from streaming import IncrementalJSONObjectParser, sse_stream
+from redflags import provisional_assessment
+from parsing import parse_assessment, AssessmentParseError, LLM_FIELDS
+from singleflight import SingleFlight
+import metrics
+from tools.hospitals import (
+    nearby_hospitals, cache_stats as hospital_cache_stats, flight_stats as places_flight_stats,
+    breaker_stats as places_breaker_stats, PLACES_URL, warm_up as warm_up_hospitals,
+)
+from tools.tts import prepare_tts_text, cached_audio_path, synthesize_stream, warm_up as warm_up_tts
+from tools import audio_cache
+from tools.weather import (
+    current_weather, cache_stats as weather_cache_stats, flight_stats as weather_flight_stats,
+    breaker_stats as weather_breaker_stats, OW_URL,
+)
+from tools import client as http_client
+
+startup.imports_done()
+log = logging.getLogger(__name__)
+
+# LangChain, openai and httpx are imported on first use. The warm-up loads
+# them and primes connections after startup: "background" (default) lets the
+# worker answer /health at once, "blocking" finishes before taking traffic,
+# "off" leaves everything to the first requests.
+STARTUP_WARMUP = (os.getenv("STARTUP_WARMUP") or "background").lower()
+
+async def _warm_up():
+    try:
+        with startup.phase("warmup"):
+            with startup.phase("warmup:chains"):
+                await asyncio.to_thread(get_cascade)
+                await asyncio.to_thread(get_repair_chain)
+            with startup.phase("warmup:tts_client"):
+                await asyncio.to_thread(warm_up_tts)
+            with startup.phase("warmup:connections"):
+                await http_client.warm_up([PLACES_URL, OW_URL])
+            with startup.phase("warmup:hospital_dataset"):
+                await asyncio.to_thread(warm_up_hospitals)
+    except Exception as e:
+        log.warning("warm-up failed: %s", e)
+    startup.log_report()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup = None
+    if STARTUP_WARMUP == "blocking":
+        await _warm_up()
+    elif STARTUP_WARMUP == "background":
+        warmup = asyncio.create_task(_warm_up())
+    else:
+        startup.log_report()
+    startup.mark("ready")
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+        await http_client.shutdown()
+
+app = FastAPI(title="Med Assist Backend", version="0.2.0", lifespan=lifespan)
 
 # CORS for your Gradio front-end
 origins = (os.getenv("ALLOWED_ORIGINS") or "").split(",")
@@ -26,9 +92,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# outermost, so the request timings include CORS handling
+app.add_middleware(metrics.MetricsMiddleware, paths=lambda: [r.path for r in app.routes])
 
-# LangChain chain
-condition_chain = build_condition_chain()
+# targeted re-asks (get_repair_chain) are used only when the output can't be repaired locally
+PARSE_MAX_REASKS = int(os.getenv("PARSE_MAX_REASKS", "1"))
+# identical triage requests in flight at the same time share one model call
+triage_flight = SingleFlight("llm")
+
+@app.exception_handler(AdmissionRejected)
+async def _shed(request, e: AdmissionRejected):
+    return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": "5"})
 
 def _fallback_city_country():
     return os.getenv("DEFAULT_CITY") or "Unknown", os.getenv("DEFAULT_COUNTRY") or "Unknown"
@@ -37,8 +111,59 @@ def _fallback_city_country():
 def health():
     return {"ok": True}
 
-@app.post("/analyze", response_model=ConditionAssessment)
-async def analyze(sym: SymptomInput):
+@app.get("/stats")
+def stats():
+    return {
+        "http_pool": http_client.pool_stats(),
+        "caches": {
+            "triage": triage_cache.stats(),
+            "hospitals": hospital_cache_stats(),
+            "weather": weather_cache_stats(),
+            "tts_audio": audio_cache.stats(),
+        },
+        "singleflight": [
+            triage_flight.stats(),
+            places_flight_stats(),
+            weather_flight_stats(),
+        ],
+        "breakers": [
+            places_breaker_stats(),
+            weather_breaker_stats(),
+        ],
+        "cascade": cascade_stats(),
+        "admission": llm_admission.stats(),
+        "startup": startup.report(),
+    }
+
+def _stats_samples():
+    s = stats()
+    for name, c in s["caches"].items():
+        labels = {"cache": name}
+        yield "medassist_cache_hits_total", "counter", "Cache hits", labels, c.get("hits")
+        yield "medassist_cache_misses_total", "counter", "Cache misses", labels, c.get("misses")
+        yield "medassist_cache_hit_ratio", "gauge", "Cache hit ratio since start", labels, c.get("hit_ratio")
+        yield "medassist_cache_entries", "gauge", "Entries currently cached", labels, c.get("size", c.get("files"))
+    for f in s["singleflight"]:
+        labels = {"layer": f["name"]}
+        yield "medassist_singleflight_originated_total", "counter", "Upstream calls started", labels, f["originated"]
+        yield "medassist_singleflight_coalesced_total", "counter", "Calls that joined one already in flight", labels, f["coalesced"]
+    for b in s["breakers"]:
+        labels = {"upstream": b["name"]}
+        yield "medassist_breaker_open", "gauge", "1 while the upstream's circuit breaker is open", labels, int(b["state"] == "open")
+        yield "medassist_breaker_rejected_total", "counter", "Calls failed fast by an open breaker", labels, b["rejected"]
+        yield "medassist_hedged_requests_total", "counter", "Hedged second requests sent", labels, b["hedged"]
+        yield "medassist_upstream_timeout_seconds", "gauge", "Current adaptive timeout", labels, b["timeout_s"]
+    for k, v in s["http_pool"].items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield f"medassist_http_pool_{k}", "gauge", f"Outbound HTTP pool {k.replace('_', ' ')}", {}, v
+
+metrics.add_collector(_stats_samples)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _chain_inputs(sym: SymptomInput) -> dict:
     age = sym.user.age if sym.user and sym.user.age else ""
     gender = sym.user.gender if sym.user and sym.user.gender else ""
     city = (sym.user.city if sym.user and sym.user.city else None)
@@ -46,19 +171,112 @@ async def analyze(sym: SymptomInput):
     if not city or not country:
         city, country = _fallback_city_country()
 
-    raw = await condition_chain.ainvoke({
+    return {
         "symptoms": sym.symptoms,
         "age": age,
         "gender": gender,
         "city": city,
         "country": country,
-    })
+    }
+
+async def _parse_assessment(raw: str) -> ConditionAssessment:
+    for attempt in range(PARSE_MAX_REASKS + 1):
+        try:
+            return parse_assessment(raw)
+        except AssessmentParseError as e:
+            if attempt == PARSE_MAX_REASKS:
+                break
+            with metrics.track("llm_repair"):
+                raw = await get_repair_chain().ainvoke({"raw": raw, "error": str(e)})
+    raise HTTPException(status_code=500, detail="Model did not return valid JSON")
+
+async def _run_triage(inputs: dict) -> ConditionAssessment:
+    async with llm_admission.slot(priority_for(inputs["symptoms"])):
+        return await get_cascade().run(inputs, _parse_assessment)
+
+async def _run_triage_and_cache(key: tuple, inputs: dict) -> ConditionAssessment:
+    assessment = await _run_triage(inputs)
+    await triage_cache.put(key, assessment)
+    return assessment
+
+@app.post("/analyze", response_model=ConditionAssessment)
+async def analyze(sym: SymptomInput):
+    inputs = _chain_inputs(sym)
+    key = triage_cache.cache_key(inputs)
+    if sym.bypass_cache:
+        triage_cache.record_bypass()
+    else:
+        cached = await triage_cache.get(key)
+        if cached is not None:
+            return cached
+
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Model did not return valid JSON")
+        assessment = await triage_flight.do(key, lambda: _run_triage_and_cache(key, inputs))
+    except Exception:
+        # obvious emergencies still get guidance when the model call fails
+        provisional = provisional_assessment(sym.symptoms)
+        if provisional is None:
+            raise
+        return provisional
+    # coalesced callers share the task's result object; /assist mutates it
+    return assessment.model_copy(deep=True)
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+def _error_detail(e: Exception) -> str:
+    return e.detail if isinstance(e, HTTPException) else str(e)
+
+@app.post("/analyze/batch", response_model=BatchAssessmentResponse)
+async def analyze_batch(batch: BatchSymptomInput):
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+    keys = []
+    results = {}  # cache key -> ConditionAssessment or Exception
+    pending = {}  # cache key -> chain inputs, one entry per distinct item
+    for sym in batch.items:
+        inputs = _chain_inputs(sym)
+        key = triage_cache.cache_key(inputs)
+        keys.append(key)
+        if key in results or key in pending:
+            continue
+        cached = None
+        if sym.bypass_cache:
+            triage_cache.record_bypass()
+        else:
+            cached = await triage_cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending[key] = inputs
+
+    if pending:
+        # each item is admitted like a single request (by its own priority),
+        # and a batch holds at most BATCH_CONCURRENCY slots or queue places
+        sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def settle(key, inputs):
+            async with sem:
+                try:
+                    return await triage_flight.do(key, lambda: _run_triage_and_cache(key, inputs))
+                except Exception as e:
+                    return e
 
-    return ConditionAssessment(**data)
+        settled = await asyncio.gather(*(settle(key, inputs) for key, inputs in pending.items()))
+        results.update(zip(pending, settled))
+
+    out = []
+    for index, (sym, key) in enumerate(zip(batch.items, keys)):
+        result = results[key]
+        if isinstance(result, Exception):
+            provisional = provisional_assessment(sym.symptoms)
+            if provisional is None:
+                out.append(BatchItemResult(index=index, error=_error_detail(result)))
+                continue
+            result = provisional
+        out.append(BatchItemResult(index=index, assessment=result))
+    return BatchAssessmentResponse(results=out)
 
 @app.post("/hospitals")
 async def hospitals(sym: SymptomInput):
@@ -67,26 +285,230 @@ async def hospitals(sym: SymptomInput):
     hos = await nearby_hospitals(sym.user.latitude, sym.user.longitude)
     return {"hospitals": hos}
 
+# Per-stage deadlines (seconds) for the /assist fan-out. Hospitals and weather
+# are best-effort: if they miss their deadline the triage result is returned
+# without them and the stage is listed in `partial`.
+ASSIST_TOTAL_BUDGET_S = float(os.getenv("ASSIST_TOTAL_BUDGET_S", "25"))
+ASSIST_LLM_TIMEOUT_S = float(os.getenv("ASSIST_LLM_TIMEOUT_S", "25"))
+ASSIST_HOSPITALS_TIMEOUT_S = float(os.getenv("ASSIST_HOSPITALS_TIMEOUT_S", "6"))
+ASSIST_WEATHER_TIMEOUT_S = float(os.getenv("ASSIST_WEATHER_TIMEOUT_S", "3"))
+
+async def _await_stage(task: asyncio.Task, deadline: float):
+    # wait_for cancels the task when its deadline has passed
+    return await asyncio.wait_for(task, timeout=max(deadline - time.monotonic(), 0))
+
+def _cancel_stages(stages: dict):
+    for task, _ in stages.values():
+        task.cancel()
+
 @app.post("/assist", response_model=ConditionAssessment)
 async def assist(sym: SymptomInput):
-    assessment: ConditionAssessment = await analyze(sym)
-
     lat = sym.user.latitude if sym.user else None
     lon = sym.user.longitude if sym.user else None
+    has_location = lat is not None and lon is not None
 
-    if lat is not None and lon is not None:
-        assessment.nearest_hospitals = await nearby_hospitals(lat, lon)
+    start = time.monotonic()
+    total_deadline = start + ASSIST_TOTAL_BUDGET_S
+
+    # Launch every stage at once; the slowest best-effort stage can no longer
+    # hold up the triage result beyond its own deadline.
+    llm_task = asyncio.create_task(analyze(sym))
+    side_tasks = {}
+    if has_location:
+        side_tasks["hospitals"] = (
+            asyncio.create_task(nearby_hospitals(lat, lon)),
+            min(start + ASSIST_HOSPITALS_TIMEOUT_S, total_deadline),
+        )
+        side_tasks["weather"] = (
+            asyncio.create_task(current_weather(lat, lon)),
+            min(start + ASSIST_WEATHER_TIMEOUT_S, total_deadline),
+        )
+
+    partial = []
+    try:
+        assessment: ConditionAssessment = await _await_stage(
+            llm_task, min(start + ASSIST_LLM_TIMEOUT_S, total_deadline)
+        )
+    except asyncio.TimeoutError:
+        assessment = provisional_assessment(sym.symptoms)
+        if assessment is None:
+            _cancel_stages(side_tasks)
+            raise HTTPException(status_code=504, detail="Triage timed out")
+        partial.append("triage")
+    except BaseException:
+        _cancel_stages(side_tasks)
+        raise
+
+    results = {}
+    for stage, (task, deadline) in side_tasks.items():
         try:
-            assessment.weather_context = await current_weather(lat, lon)
+            results[stage] = await _await_stage(task, deadline)
         except Exception:
-            assessment.weather_context = None
+            results[stage] = None
+        if results[stage] is None:  # failed, or nothing to fall back on while its breaker is open
+            partial.append(stage)
+
+    if has_location:
+        assessment.nearest_hospitals = results.get("hospitals")
+        assessment.weather_context = results.get("weather")
+    assessment.partial = partial or None
 
     return assessment
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _field_events(assessment: ConditionAssessment):
+    for name in LLM_FIELDS:
+        value = getattr(assessment, name)
+        if value is not None:
+            yield name, value
+
+async def _triage_events(sym: SymptomInput):
+    """Yield (event, data) pairs: a `provisional` assessment when the local
+    red-flag matcher fires, one event per assessment field as the model
+    produces it (or once the answer is final, if the cascade may escalate),
+    then the validated `assessment`."""
+    inputs = _chain_inputs(sym)
+    key = triage_cache.cache_key(inputs)
+    cached = None
+    if sym.bypass_cache:
+        triage_cache.record_bypass()
+    else:
+        cached = await triage_cache.get(key)
+    if cached is not None:
+        for event in _field_events(cached):
+            yield event
+        yield "assessment", cached.model_dump()
+        return
+
+    provisional = provisional_assessment(sym.symptoms)
+    if provisional is not None:
+        yield "provisional", provisional.model_dump()
+
+    # the first cascade tier is streamed. When it may still be escalated its
+    # fields are held back and the final answer's fields are sent instead.
+    cascade = get_cascade()
+    stream_fields = len(cascade.tiers) == 1
+    parser = IncrementalJSONObjectParser()
+    chunks = []
+    async with llm_admission.slot(priority_for(sym.symptoms)):
+        start = time.perf_counter()
+        with metrics.track("llm_stream"):
+            async for chunk in cascade.first.chain.astream(inputs):
+                chunks.append(chunk)
+                for name, value in parser.feed(chunk):
+                    if stream_fields and name in LLM_FIELDS:
+                        yield name, value
+
+        assessment = await cascade.run(inputs, _parse_assessment, first_raw="".join(chunks),
+                                       first_latency_s=time.perf_counter() - start)
+    await triage_cache.put(key, assessment)
+    if not stream_fields:
+        for event in _field_events(assessment):
+            yield event
+    yield "assessment", assessment.model_dump()
+
+async def _guarded(events):
+    try:
+        async for event in events:
+            yield event
+    except HTTPException as e:
+        yield "error", {"detail": e.detail}
+    except Exception as e:
+        yield "error", {"detail": str(e)}
+    yield "done", {}
+
+@app.post("/analyze/stream")
+async def analyze_stream(sym: SymptomInput):
+    return StreamingResponse(
+        sse_stream(_guarded(_triage_events(sym))),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+async def _assist_events(sym: SymptomInput):
+    lat = sym.user.latitude if sym.user else None
+    lon = sym.user.longitude if sym.user else None
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def triage():
+        async def pump():
+            async for event in _triage_events(sym):
+                await queue.put(event)
+        try:
+            await asyncio.wait_for(pump(), timeout=min(ASSIST_LLM_TIMEOUT_S, ASSIST_TOTAL_BUDGET_S))
+        except asyncio.TimeoutError:
+            await queue.put(("error", {"detail": "Triage timed out"}))
+        except HTTPException as e:
+            await queue.put(("error", {"detail": e.detail}))
+        except Exception as e:
+            await queue.put(("error", {"detail": str(e)}))
+        finally:
+            await queue.put(None)
+
+    async def side(stage: str, coro, timeout: float):
+        try:
+            result = await asyncio.wait_for(coro, timeout=min(timeout, ASSIST_TOTAL_BUDGET_S))
+            if result is None:
+                raise RuntimeError(f"no {stage} data")
+            await queue.put((stage, result))
+        except Exception:
+            await queue.put(("partial", {"stage": stage}))
+        finally:
+            await queue.put(None)
+
+    tasks = [asyncio.create_task(triage())]
+    if lat is not None and lon is not None:
+        tasks.append(asyncio.create_task(side("hospitals", nearby_hospitals(lat, lon), ASSIST_HOSPITALS_TIMEOUT_S)))
+        tasks.append(asyncio.create_task(side("weather", current_weather(lat, lon), ASSIST_WEATHER_TIMEOUT_S)))
+
+    try:
+        pending = len(tasks)
+        while pending:
+            event = await queue.get()
+            if event is None:
+                pending -= 1
+                continue
+            yield event
+        yield "done", {}
+    finally:
+        # client went away or we finished: stop anything still running
+        for task in tasks:
+            task.cancel()
+
+@app.post("/assist/stream")
+async def assist_stream(sym: SymptomInput):
+    return StreamingResponse(
+        sse_stream(_assist_events(sym)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+async def _primed(chunks):
+    """Pull the first chunk up front so upstream failures still become an HTTP error
+    instead of a truncated 200 response."""
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def body():
+        if first:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    return body()
+
 @app.post("/tts")
 async def tts(req: TTSRequest):
+    voice = req.voice or "alloy"
     try:
-        audio_bytes = tts_to_mp3_bytes(req.text, voice=(req.voice or "alloy"))
-        return Response(content=audio_bytes, media_type="audio/mpeg")
+        clean_text = prepare_tts_text(req.text)
+        # cached audio is served straight from disk (sendfile where the server supports it)
+        path = cached_audio_path(clean_text, voice)
+        if path:
+            return FileResponse(path, media_type="audio/mpeg")
+        audio = await _primed(synthesize_stream(clean_text, voice))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(audio, media_type="audio/mpeg")
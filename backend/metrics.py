@@ -0,0 +1,171 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Minimal in-process Prometheus metrics. Updates are plain dict operations on
+# the event loop thread, cheap enough to leave on in production; /metrics
+# renders them in the text exposition format.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+
+_registry: List["_Metric"] = []
+# callables returning (name, type, help, labels, value) samples at render time
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(pairs: Iterable[Tuple[str, object]]) -> str:
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}" if body else ""
+
+def _number(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(zip(self.labelnames, k))} {_number(v)}" for k, v in self._values.items()]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts..., +Inf count], sum
+        self._values: Dict[tuple, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {total[0]!r}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {cumulative}")
+        return lines
+
+REQUESTS = Counter("medassist_http_requests_total", "HTTP requests by endpoint, method and status",
+                   ("endpoint", "method", "status"))
+REQUEST_SECONDS = Histogram("medassist_http_request_duration_seconds", "HTTP request latency (until the response completes)",
+                            ("endpoint",))
+REQUESTS_IN_FLIGHT = Gauge("medassist_http_requests_in_flight", "HTTP requests currently being served", ("endpoint",))
+UPSTREAM_SECONDS = Histogram("medassist_upstream_duration_seconds", "Latency of upstream calls (llm, places, openweather, tts)",
+                             ("upstream", "outcome"))
+UPSTREAM_IN_FLIGHT = Gauge("medassist_upstream_in_flight", "Upstream calls currently in flight", ("upstream",))
+
+@contextmanager
+def track(upstream: str):
+    """Time one upstream call and count it as in flight while it runs"""
+    UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, upstream=upstream, outcome=outcome)
+
+def add_collector(fn: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]) -> None:
+    _collectors.append(fn)
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        samples = metric.render()
+        if samples:
+            lines.extend(metric.header())
+            lines.extend(samples)
+
+    # the exposition format wants each family's samples together
+    families: Dict[str, List[str]] = {}
+    for collector in _collectors:
+        for name, mtype, help, labels, value in collector():
+            if value is None:
+                continue
+            if name not in families:
+                families[name] = [f"# HELP {name} {help}", f"# TYPE {name} {mtype}"]
+            families[name].append(f"{name}{_labels(labels.items())} {_number(value)}")
+    for family in families.values():
+        lines.extend(family)
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests per route; unknown paths share the "other" label"""
+
+    def __init__(self, app, paths: Optional[Callable[[], Iterable[str]]] = None):
+        self.app = app
+        self._paths_fn = paths
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if self._paths is None:
+            self._paths = set(self._paths_fn()) if self._paths_fn else set()
+        endpoint = scope["path"] if scope["path"] in self._paths else "other"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+            REQUESTS.inc(endpoint=endpoint, method=scope["method"], status=status)
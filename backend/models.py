@@ -4,8 +4,8 @@ from typing import List, Optional
 class UserContext(BaseModel):
     age: Optional[int] = None
     gender: Optional[str] = Field(default=None, description="male|female|other")
-    latitude: Optional[float] = None
-    longitude: Optional[float] = None
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
     address: Optional[str] = None
     city: Optional[str] = None
     country: Optional[str] = None
@@ -19,10 +19,24 @@ class ConditionAssessment(BaseModel):
     self_care_advice: Optional[str] = None
     nearest_hospitals: Optional[List[dict]] = None
     weather_context: Optional[dict] = None
+    partial: Optional[List[str]] = None  # /assist stages dropped after missing their deadline
+    provisional: bool = False            # built by the local red-flag matcher, not the model
 
 class SymptomInput(BaseModel):
     symptoms: str
     user: Optional[UserContext] = None
+    bypass_cache: bool = False  # skip cached triage results (a fresh result still refreshes the cache)
+
+class BatchSymptomInput(BaseModel):
+    items: List[SymptomInput]
+
+class BatchItemResult(BaseModel):
+    index: int
+    assessment: Optional[ConditionAssessment] = None
+    error: Optional[str] = None
+
+class BatchAssessmentResponse(BaseModel):
+    results: List[BatchItemResult]  # same order as the request items
 
 class TTSRequest(BaseModel):
     text: str
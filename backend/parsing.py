@@ -0,0 +1,124 @@
+import re
+import json
+import math
+from typing import Union
+
+from pydantic import ValidationError
+
+from models import ConditionAssessment
+
+# Fields the model is asked to return (see chains.SYSTEM_PROMPT)
+LLM_FIELDS = ("condition_type", "severity", "confidence", "red_flags", "recommended_actions", "self_care_advice")
+
+SEVERITIES = {"low", "moderate", "high", "critical"}
+CONDITION_TYPES = {
+    "cardiac", "respiratory", "allergic", "infectious", "injury",
+    "neurological", "gastrointestinal", "unknown",
+}
+SEVERITY_ALIASES = {
+    "mild": "low",
+    "minor": "low",
+    "medium": "moderate",
+    "mod": "moderate",
+    "severe": "high",
+    "serious": "high",
+    "urgent": "high",
+    "emergency": "critical",
+    "life-threatening": "critical",
+    "life threatening": "critical",
+}
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+class AssessmentParseError(ValueError):
+    pass
+
+def _is_clean(a: ConditionAssessment) -> bool:
+    return (
+        a.severity in SEVERITIES
+        and a.condition_type in CONDITION_TYPES
+        and 0.0 <= a.confidence <= 1.0
+        and a.nearest_hospitals is None
+        and a.weather_context is None
+        and a.partial is None
+        and not a.provisional
+    )
+
+def _extract_object(text: str) -> dict:
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise AssessmentParseError("no JSON object in model output")
+    text = _TRAILING_COMMA_RE.sub(r"\1", text[start:end + 1])
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise AssessmentParseError(f"invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise AssessmentParseError("model output is not a JSON object")
+    return data
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [str(value)]  # a lone number, bool or object
+
+def _coerce(data: dict) -> dict:
+    missing = [f for f in LLM_FIELDS[:5] if f not in data]
+    if missing:
+        raise AssessmentParseError(f"missing keys: {', '.join(missing)}")
+    out = {k: data.get(k) for k in LLM_FIELDS}
+
+    severity = str(out["severity"]).strip().lower()
+    severity = SEVERITY_ALIASES.get(severity, severity)
+    if severity not in SEVERITIES:
+        raise AssessmentParseError(f"severity must be one of {sorted(SEVERITIES)}, got {out['severity']!r}")
+    out["severity"] = severity
+
+    condition_type = str(out["condition_type"]).strip().lower()
+    out["condition_type"] = condition_type if condition_type in CONDITION_TYPES else "unknown"
+
+    try:
+        confidence = float(str(out["confidence"]).strip().rstrip("%"))
+    except ValueError:
+        raise AssessmentParseError(f"confidence must be a number, got {out['confidence']!r}")
+    if not math.isfinite(confidence):
+        raise AssessmentParseError(f"confidence must be finite, got {out['confidence']!r}")
+    if 1.0 < confidence <= 100.0:
+        confidence /= 100.0  # percentages
+    out["confidence"] = min(max(confidence, 0.0), 1.0)
+
+    out["red_flags"] = _as_list(out["red_flags"])
+    out["recommended_actions"] = _as_list(out["recommended_actions"])
+    if isinstance(out["self_care_advice"], list):
+        out["self_care_advice"] = " ".join(str(v) for v in out["self_care_advice"]) or None
+    return out
+
+def parse_assessment(raw: Union[str, bytes]) -> ConditionAssessment:
+    """Validate model output as a ConditionAssessment, repairing common slips.
+
+    Well-formed output is validated straight from the JSON text. Otherwise
+    code fences, surrounding prose and trailing commas are stripped, extra
+    keys dropped and severity/condition/confidence coerced into range.
+    Raises AssessmentParseError when the output can't be repaired.
+    """
+    try:
+        assessment = ConditionAssessment.model_validate_json(raw)
+        if _is_clean(assessment):
+            return assessment
+    except ValidationError:
+        pass
+
+    text = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+    try:
+        return ConditionAssessment.model_validate(_coerce(_extract_object(text)))
+    except (ValidationError, TypeError, ValueError) as e:
+        # anything the coercion didn't anticipate is still a parse failure, so callers re-ask
+        raise AssessmentParseError(str(e))
@@ -0,0 +1,223 @@
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from models import ConditionAssessment
+
+# Curated red-flag lexicon: phrase -> (condition_type, red flag shown to the user).
+# Phrases are matched on lower-cased, whitespace-normalized text at word boundaries.
+RED_FLAG_LEXICON: Dict[str, Tuple[str, str]] = {
+    # cardiac
+    "crushing chest pain": ("cardiac", "Crushing chest pain"),
+    "chest pain radiating": ("cardiac", "Chest pain radiating to arm, jaw or back"),
+    "pain radiating to left arm": ("cardiac", "Chest pain radiating to arm, jaw or back"),
+    "radiating to left arm": ("cardiac", "Chest pain radiating to arm, jaw or back"),
+    "radiating to the left arm": ("cardiac", "Chest pain radiating to arm, jaw or back"),
+    "radiating to jaw": ("cardiac", "Chest pain radiating to arm, jaw or back"),
+    "chest pressure": ("cardiac", "Chest pressure"),
+    "heart attack": ("cardiac", "Possible heart attack"),
+    "no pulse": ("cardiac", "No pulse"),
+    "cardiac arrest": ("cardiac", "Cardiac arrest"),
+    # neurological
+    "facial drooping": ("neurological", "Facial drooping (possible stroke)"),
+    "face drooping": ("neurological", "Facial drooping (possible stroke)"),
+    "weakness on one side": ("neurological", "One-sided weakness (possible stroke)"),
+    "weakness on right side": ("neurological", "One-sided weakness (possible stroke)"),
+    "weakness on left side": ("neurological", "One-sided weakness (possible stroke)"),
+    "sudden weakness on right side": ("neurological", "One-sided weakness (possible stroke)"),
+    "sudden weakness on left side": ("neurological", "One-sided weakness (possible stroke)"),
+    "difficulty speaking": ("neurological", "Difficulty speaking (possible stroke)"),
+    "slurred speech": ("neurological", "Slurred speech (possible stroke)"),
+    "worst headache": ("neurological", "Sudden worst-ever headache"),
+    "thunderclap headache": ("neurological", "Sudden worst-ever headache"),
+    "sudden severe headache": ("neurological", "Sudden severe headache"),
+    "neck stiffness": ("neurological", "Neck stiffness with headache or fever"),
+    "seizure": ("neurological", "Seizure"),
+    "unconscious": ("neurological", "Loss of consciousness"),
+    "unresponsive": ("neurological", "Unresponsive"),
+    "passed out": ("neurological", "Loss of consciousness"),
+    # respiratory
+    "can't breathe": ("respiratory", "Severe difficulty breathing"),
+    "cannot breathe": ("respiratory", "Severe difficulty breathing"),
+    "difficulty breathing": ("respiratory", "Difficulty breathing"),
+    "not breathing": ("respiratory", "Not breathing"),
+    "choking": ("respiratory", "Choking"),
+    "blue lips": ("respiratory", "Blue lips or face"),
+    "coughing blood": ("respiratory", "Coughing up blood"),
+    "cough with blood": ("respiratory", "Coughing up blood"),
+    # allergic
+    "anaphylaxis": ("allergic", "Anaphylaxis"),
+    "throat swelling": ("allergic", "Throat swelling"),
+    "swollen throat": ("allergic", "Throat swelling"),
+    "tongue swelling": ("allergic", "Tongue swelling"),
+    "facial swelling": ("allergic", "Facial swelling"),
+    "severe allergic reaction": ("allergic", "Severe allergic reaction"),
+    # injury
+    "severe bleeding": ("injury", "Severe bleeding"),
+    "won't stop bleeding": ("injury", "Uncontrolled bleeding"),
+    "heavy bleeding": ("injury", "Severe bleeding"),
+    "head injury": ("injury", "Head injury"),
+    "gunshot": ("injury", "Penetrating injury"),
+    "stab wound": ("injury", "Penetrating injury"),
+    # gastrointestinal
+    "vomiting blood": ("gastrointestinal", "Vomiting blood"),
+    "black stool": ("gastrointestinal", "Black or bloody stool"),
+    "bloody stool": ("gastrointestinal", "Black or bloody stool"),
+    # other
+    "suicidal": ("unknown", "Thoughts of suicide or self-harm"),
+    "overdose": ("unknown", "Possible overdose"),
+    "poisoning": ("unknown", "Possible poisoning"),
+}
+
+# A match is ignored when one of these appears within NEGATION_WINDOW tokens
+# before it in the same clause ("no chest pressure", "denies seizure or head
+# injury"). A contraction only counts when it governs a have/any phrase
+# ("doesn't have chest pressure"), so "can't stop vomiting blood" or "couldn't
+# breathe and had crushing chest pain" still match.
+NEGATION_CUES = {"no", "not", "denies", "denied", "deny", "without", "never", "nor", "negative"}
+NEGATING_CONTRACTIONS = {"don't", "doesn't", "didn't", "haven't", "hasn't", "hadn't"}
+_NEGATED_VERBS = {"have", "has", "had", "any", "get", "got", "feel", "experience", "notice"}
+NEGATION_WINDOW = 4
+_CLAUSE_BREAK_RE = re.compile(r"[,.;:!?()]|\b(?:but|however|though|although|except)\b")
+
+FIRST_ACTION = "Call emergency services (e.g. 911) immediately"
+
+CONDITION_ACTIONS = {
+    "cardiac": ["Stop all activity and sit or lie down", "Chew an aspirin if not allergic and no bleeding risk"],
+    "neurological": ["Note the time symptoms started", "Do not give food, drink or medication"],
+    "respiratory": ["Sit upright and keep calm", "Use a prescribed rescue inhaler if available"],
+    "allergic": ["Use an epinephrine auto-injector if available", "Lie down with legs raised unless breathing is harder"],
+    "injury": ["Apply firm pressure to any bleeding", "Do not move the person if a head or spine injury is possible"],
+    "gastrointestinal": ["Do not eat or drink", "Keep any vomit or stool sample for responders"],
+    "unknown": ["Stay with the person until help arrives"],
+}
+
+class _Automaton:
+    """Aho-Corasick automaton over the lexicon phrases"""
+
+    def __init__(self, phrases):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[str]] = [[]]
+        for phrase in phrases:
+            node = 0
+            for ch in phrase:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(phrase)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def search(self, text: str) -> List[Tuple[int, str]]:
+        """(end index, phrase) for every occurrence"""
+        found = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for phrase in self.out[node]:
+                found.append((i, phrase))
+        return found
+
+_automaton = _Automaton(RED_FLAG_LEXICON)
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("’", "'").split())
+
+def _negated(text: str, start: int) -> bool:
+    clause = _CLAUSE_BREAK_RE.split(text[:start])[-1]
+    window = clause.split()[-NEGATION_WINDOW:]
+    for t, following in zip(window, window[1:] + [""]):
+        if t in NEGATION_CUES or (t in NEGATING_CONTRACTIONS and following in _NEGATED_VERBS):
+            return True
+    return False
+
+def match_red_flags(symptoms: str) -> List[str]:
+    """Lexicon phrases found (and not negated) in the symptom text, in order of appearance"""
+    text = _normalize(symptoms)
+    phrases = []
+    for end, phrase in _automaton.search(text):
+        start = end - len(phrase) + 1
+        # whole words only
+        if start > 0 and text[start - 1].isalnum():
+            continue
+        if end + 1 < len(text) and text[end + 1].isalnum():
+            continue
+        if _negated(text, start):
+            continue
+        if phrase not in phrases:
+            phrases.append(phrase)
+    return phrases
+
+def provisional_assessment(symptoms: str) -> Optional[ConditionAssessment]:
+    """Critical assessment built locally from lexicon matches, or None when nothing matches.
+
+    It follows the SYSTEM_PROMPT rule for life-threatening red flags and is
+    meant to be shown until the model's assessment replaces it.
+    """
+    phrases = match_red_flags(symptoms)
+    if not phrases:
+        return None
+
+    conditions = [RED_FLAG_LEXICON[p][0] for p in phrases]
+    # most frequent condition, ties broken by first appearance
+    condition_type = max(dict.fromkeys(conditions), key=conditions.count)
+    red_flags = list(dict.fromkeys(RED_FLAG_LEXICON[p][1] for p in phrases))
+    return ConditionAssessment(
+        condition_type=condition_type,
+        severity="critical",
+        confidence=0.5,
+        red_flags=red_flags,
+        recommended_actions=[FIRST_ACTION] + CONDITION_ACTIONS[condition_type],
+        self_care_advice=None,
+        provisional=True,
+    )
+
+# (symptom text, expected matches) checked by `python -m redflags`
+LEXICON_CHECKS = [
+    ("Crushing chest pain radiating to the left arm",
+     ["crushing chest pain", "chest pain radiating", "radiating to the left arm"]),
+    ("He is not breathing", ["not breathing"]),
+    ("Slurred speech and face drooping since this morning", ["slurred speech", "face drooping"]),
+    ("mild rash, no difficulty breathing, no chest pressure", []),
+    ("denies seizure or head injury", []),
+    ("doesn't have chest pressure", []),
+    ("no fever, but slurred speech", ["slurred speech"]),
+    ("no rash; seizure an hour ago", ["seizure"]),
+    ("without any history of seizure", []),
+    ("no cough for weeks and then a seizure", ["seizure"]),  # cue is more than NEGATION_WINDOW tokens back
+    ("can't stop vomiting blood", ["vomiting blood"]),
+    ("won't stop coughing blood", ["coughing blood"]),
+    ("I couldn't breathe and had crushing chest pain", ["crushing chest pain"]),
+    ("hasn't had any seizure", []),
+]
+
+def check_lexicon() -> bool:
+    ok = True
+    for text, expected in LEXICON_CHECKS:
+        found = match_red_flags(text)
+        if found != expected:
+            print(f"❌ {text!r}: expected {expected}, got {found}")
+            ok = False
+    if ok:
+        print(f"✅ {len(LEXICON_CHECKS)} red-flag checks passed")
+    return ok
+
+if __name__ == "__main__":
+    raise SystemExit(0 if check_lexicon() else 1)
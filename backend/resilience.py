@@ -0,0 +1,165 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Per-upstream circuit breaker. After BREAKER_FAILURE_THRESHOLD consecutive
+# failures calls fail fast with CircuitOpenError for BREAKER_RESET_S, then a
+# single probe is let through (half-open) to decide whether to close again.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_S = float(os.getenv("BREAKER_RESET_S", "30"))
+# Adaptive timeouts: ADAPTIVE_TIMEOUT_FACTOR x the recent p99 latency, kept
+# between ADAPTIVE_TIMEOUT_MIN_S and the upstream's configured timeout.
+ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv("ADAPTIVE_TIMEOUT_FACTOR", "2"))
+ADAPTIVE_TIMEOUT_MIN_S = float(os.getenv("ADAPTIVE_TIMEOUT_MIN_S", "0.5"))
+# Hedging: when enabled for an upstream, a second request is sent if the
+# first has not answered after the recent p95 (at least HEDGE_MIN_DELAY_S).
+HEDGE_MIN_DELAY_S = float(os.getenv("HEDGE_MIN_DELAY_S", "0.05"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+LATENCY_MIN_SAMPLES = 20
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class UpstreamStatusError(RuntimeError):
+    """Error reported in the body of a successful HTTP response (e.g. a Places `status`)"""
+
+    def __init__(self, upstream: str, status: str, failure: bool = False):
+        super().__init__(f"{upstream} returned {status}")
+        self.status = status
+        self.failure = failure  # counts against the breaker (quota, upstream-side errors)
+
+def is_upstream_failure(e: BaseException) -> bool:
+    """Timeouts, transport errors, 5xx, 429 and quota errors count against the breaker; other 4xx don't"""
+    import httpx  # already loaded by whoever made the request
+
+    if isinstance(e, UpstreamStatusError):
+        return e.failure
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500 or e.response.status_code == 429
+    return isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError))
+
+class Upstream:
+    """Circuit breaker, latency-adaptive timeout and optional hedging for one upstream"""
+
+    def __init__(self, name: str, max_timeout_s: float, hedge: bool = False):
+        self.name = name
+        self.max_timeout_s = max_timeout_s
+        self.hedge = hedge
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._probing = False
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if len(self._latencies) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+    def timeout(self) -> float:
+        p99 = self._percentile(99)
+        if p99 is None:
+            return self.max_timeout_s
+        return min(max(p99 * ADAPTIVE_TIMEOUT_FACTOR, ADAPTIVE_TIMEOUT_MIN_S), self.max_timeout_s)
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p95 = self._percentile(95)
+        return max(p95, HEDGE_MIN_DELAY_S) if p95 is not None else None
+
+    def _allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= BREAKER_RESET_S:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def _record(self, ok: bool, latency: Optional[float] = None) -> None:
+        self._probing = False
+        if ok:
+            self.state = CLOSED
+            self.failures = 0
+            self._latencies.append(latency)
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= BREAKER_FAILURE_THRESHOLD:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    async def call(self, fn: Callable[[float], Awaitable[T]]) -> T:
+        """Run fn(timeout_s) through the breaker; raises CircuitOpenError while open"""
+        if not self._allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit open")
+        timeout = self.timeout()
+        start = time.monotonic()
+        try:
+            result = await self._attempts(fn, timeout)
+        except BaseException as e:
+            if is_upstream_failure(e):
+                self._record(False)
+            else:
+                self._probing = False
+            raise
+        self._record(True, time.monotonic() - start)
+        return result
+
+    async def _attempts(self, fn: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        delay = self.hedge_delay()
+        first = asyncio.ensure_future(fn(timeout))
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(first, timeout)
+
+        deadline = time.monotonic() + timeout
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks.add(asyncio.ensure_future(fn(deadline - time.monotonic())))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, timeout=max(deadline - time.monotonic(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        p50, p95, p99 = self._percentile(50), self._percentile(95), self._percentile(99)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "timeout_s": round(self.timeout(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+        }
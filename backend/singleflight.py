@@ -0,0 +1,43 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Shares one upstream call among concurrent callers that use the same key.
+
+    The first caller starts the call; callers arriving while it is in flight
+    await the same task. The task is shielded, so one caller giving up (e.g. a
+    deadline in /assist) does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.originated = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            self.originated += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller gave up
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": len(self._inflight),
+            "originated": self.originated,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,64 @@
+import sys
+import time
+import logging
+import builtins
+from contextlib import contextmanager
+from typing import Dict
+
+# Startup timing, reported in /stats. main imports this module first; until
+# imports_done() an __import__ hook attributes each top-level import made by
+# our modules (including everything it pulls in) to the name imported.
+# `python -X importtime` gives the full tree when this isn't enough.
+
+log = logging.getLogger(__name__)
+
+_t0 = time.perf_counter()
+_imports: Dict[str, float] = {}
+_phases: Dict[str, float] = {}
+_marks: Dict[str, float] = {}
+_depth = 0
+_original_import = builtins.__import__
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    global _depth
+    if _depth or level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    _depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _depth -= 1
+        _imports[name] = _imports.get(name, 0.0) + time.perf_counter() - start
+
+builtins.__import__ = _timed_import
+
+def imports_done() -> None:
+    builtins.__import__ = _original_import
+    _marks.setdefault("imports", time.perf_counter() - _t0)
+
+def mark(name: str) -> None:
+    """Record the time since startup began under `name` (first call wins)"""
+    _marks.setdefault(name, time.perf_counter() - _t0)
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = time.perf_counter() - start
+
+def report(top: int = 12) -> dict:
+    slowest = sorted(_imports.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        **{f"{k}_s": round(v, 3) for k, v in _marks.items()},
+        "imports": {k: round(v, 3) for k, v in slowest},
+        "phases": {k: round(v, 3) for k, v in _phases.items()},
+    }
+
+def log_report() -> None:
+    r = report(top=5)
+    log.info("startup: %s; slowest imports: %s; phases: %s",
+             ", ".join(f"{k}={v}" for k, v in r.items() if k.endswith("_s")),
+             r["imports"], r["phases"])
@@ -0,0 +1,73 @@
+import json
+from typing import Any, AsyncIterator, List, Tuple
+
+class IncrementalJSONObjectParser:
+    """Emits top-level members of a streamed JSON object as soon as each one is complete.
+
+    Text before the opening brace (e.g. a ``` fence) is skipped. Members that
+    fail to parse are dropped; the caller still validates the full text at the end.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        if self._done or not chunk:
+            return []
+        self._buf += chunk
+        members = []
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    if c != "{":
+                        self._done = True
+                        break
+                    self._member_start = i + 1
+            elif c in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._member(buf[self._member_start:i]))
+                    self._done = True
+                    break
+            elif c == "," and self._depth == 1:
+                members.extend(self._member(buf[self._member_start:i]))
+                self._member_start = i + 1
+            i += 1
+        self._pos = i
+        return members
+
+    @staticmethod
+    def _member(text: str) -> List[Tuple[str, Any]]:
+        if not text.strip():
+            return []
+        try:
+            return list(json.loads("{" + text + "}").items())
+        except json.JSONDecodeError:
+            return []
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def sse_stream(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    async for event, data in events:
+        yield sse_event(event, data)
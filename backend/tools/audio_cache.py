@@ -0,0 +1,145 @@
+import os
+import stat
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+from cache import make_cache, private_dir
+
+log = logging.getLogger(__name__)
+
+# Content-addressed store for synthesized audio. Files are named by a hash of
+# the cleaned text, voice, model and format, written atomically (temp file +
+# rename) and evicted least-recently-used once the directory exceeds the cap.
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR") or os.path.join(private_dir("med-assist"), "tts")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+TTS_CACHE_ENABLED = (os.getenv("TTS_CACHE_ENABLED") or "true").lower() not in ("0", "false", "no")
+
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+_evict_lock = threading.Lock()
+# Running estimate of the directory size, shared between workers through the
+# cache backend, so evict() only walks the directory once the cap may be
+# exceeded. Each walk resets it to the measured total.
+_usage = make_cache("tts_audio_usage", maxsize=1, ttl=3600)
+
+def audio_key(clean_text: str, voice: str, model: str, fmt: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, voice, fmt, clean_text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def path_for(key: str, fmt: str = "mp3") -> str:
+    return os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.{fmt}")
+
+def lookup(key: str, fmt: str = "mp3") -> Optional[str]:
+    """Path of a cached file (touched for LRU), or None"""
+    if not TTS_CACHE_ENABLED:
+        return None
+    path = path_for(key, fmt)
+    try:
+        # only serve regular files, never whatever a symlink points at
+        if not stat.S_ISREG(os.lstat(path).st_mode):
+            raise OSError(f"{path} is not a regular file")
+        os.utime(path)
+    except OSError:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return path
+
+def stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "name": "tts_audio",
+        "dir": TTS_CACHE_DIR,
+        "max_bytes": TTS_CACHE_MAX_BYTES,
+        **_stats,
+        "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+def evict(max_bytes: int = TTS_CACHE_MAX_BYTES) -> None:
+    """Delete least-recently-used files until the cache is back under 90% of the cap"""
+    with _evict_lock:
+        files = []
+        total = 0
+        for root, _, names in os.walk(TTS_CACHE_DIR):
+            for name in names:
+                if name.startswith("."):
+                    continue  # in-progress temp files
+                path = os.path.join(root, name)
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= max_bytes:
+            _usage.set("bytes", total)
+            return
+        files.sort()
+        target = int(max_bytes * 0.9)
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            _stats["evicted"] += 1
+        _usage.set("bytes", total)
+
+def record_write(size: int, max_bytes: int = TTS_CACHE_MAX_BYTES) -> None:
+    """Account for a newly written file, evicting if the cache may now be over the cap"""
+    total = _usage.get("bytes")
+    if total is None or total + size > max_bytes:
+        evict(max_bytes)
+    else:
+        _usage.set("bytes", total + size)
+
+class AudioWriter:
+    """Writes one cache entry; nothing becomes visible until commit()"""
+
+    def __init__(self, key: str, fmt: str = "mp3"):
+        self.path = path_for(key, fmt)
+        self._tmp = None
+        self._f = None
+        if not TTS_CACHE_ENABLED:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, self._tmp = tempfile.mkstemp(prefix=".", suffix=".part", dir=os.path.dirname(self.path))
+            self._f = os.fdopen(fd, "wb")
+        except OSError as e:
+            log.warning("TTS cache disabled for this entry: %s", e)
+            self._tmp = self._f = None
+
+    def write(self, chunk: bytes) -> None:
+        if self._f is not None:
+            self._f.write(chunk)
+
+    async def commit(self) -> None:
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        size = os.path.getsize(self._tmp)
+        os.replace(self._tmp, self.path)
+        self._tmp = None
+        _stats["writes"] += 1
+        await asyncio.to_thread(record_write, size)
+
+    def abort(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if self._tmp is not None:
+            try:
+                os.remove(self._tmp)
+            except OSError:
+                pass
+            self._tmp = None
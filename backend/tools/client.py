@@ -0,0 +1,120 @@
+import os
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import httpx
+
+log = logging.getLogger(__name__)
+
+# Application-scoped HTTP client shared by every tool. get_client() creates it
+# on first use (or during the startup warm-up) and the FastAPI lifespan closes
+# it on shutdown; outside the app (scripts, REPL) it works the same way. httpx
+# itself is imported on first use so it stays out of the worker's import time.
+_client: Optional["httpx.AsyncClient"] = None
+_http2_enabled = False
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "30"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "3"))
+HTTP_DEFAULT_TIMEOUT_S = float(os.getenv("HTTP_DEFAULT_TIMEOUT_S", "10"))
+HTTP2 = (os.getenv("HTTP2") or "").lower() in ("1", "true", "yes")
+
+# Read timeouts per upstream host
+HOST_TIMEOUTS = {
+    "maps.googleapis.com": float(os.getenv("PLACES_TIMEOUT_S", "8")),
+    "api.openweathermap.org": float(os.getenv("OPENWEATHER_TIMEOUT_S", "5")),
+}
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def build_client() -> "httpx.AsyncClient":
+    import httpx
+
+    global _http2_enabled
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+    )
+    http2 = HTTP2
+    if http2 and not _http2_available():
+        log.warning("HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+    _http2_enabled = http2
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=http2,
+        timeout=httpx.Timeout(HTTP_DEFAULT_TIMEOUT_S, connect=HTTP_CONNECT_TIMEOUT_S),
+    )
+
+def get_client() -> "httpx.AsyncClient":
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_client()
+    return _client
+
+async def warm_up(urls) -> None:
+    """Create the client and open a connection to each URL's origin (responses are ignored)"""
+    client = get_client()
+    origins = {f"{p.scheme}://{p.netloc}/" for p in map(urlsplit, urls)}
+
+    async def touch(origin):
+        try:
+            await client.head(origin, timeout=timeout_for(origin))
+        except Exception as e:
+            log.info("warm-up: %s unreachable (%s)", origin, e)
+
+    await asyncio.gather(*(touch(o) for o in origins))
+
+async def shutdown():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def read_timeout_for(url: str) -> float:
+    return HOST_TIMEOUTS.get(urlsplit(url).hostname or "", HTTP_DEFAULT_TIMEOUT_S)
+
+def timeout_for(url: str, read: Optional[float] = None) -> "httpx.Timeout":
+    import httpx
+
+    return httpx.Timeout(read or read_timeout_for(url), connect=HTTP_CONNECT_TIMEOUT_S)
+
+def pool_stats() -> dict:
+    """Connection-pool usage of the shared client (best effort, reads httpcore internals)"""
+    stats = {
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive": HTTP_MAX_KEEPALIVE,
+        "http2": _http2_enabled,
+        "connections": 0,
+        "active": 0,
+        "idle": 0,
+        "waiting": 0,
+        "saturation": 0.0,
+    }
+    if _client is None or _client.is_closed:
+        return stats
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    if pool is None:
+        return stats
+
+    connections = list(getattr(pool, "_connections", []))
+    idle = sum(1 for c in connections if c.is_idle())
+    stats["connections"] = len(connections)
+    stats["idle"] = idle
+    stats["active"] = len(connections) - idle
+    stats["waiting"] = sum(
+        1 for r in getattr(pool, "_requests", []) if getattr(r, "connection", None) is None
+    )
+    if HTTP_MAX_CONNECTIONS:
+        stats["saturation"] = round(stats["active"] / HTTP_MAX_CONNECTIONS, 3)
+    return stats
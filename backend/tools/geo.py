@@ -0,0 +1,22 @@
+import math
+from typing import TYPE_CHECKING, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+def grid_cell(lat: float, lon: float, cell_deg: float) -> Tuple[int, int]:
+    """Quantize a coordinate to an integer grid cell of `cell_deg` degrees"""
+    return (math.floor(lat / cell_deg), math.floor(lon / cell_deg))
+
+def haversine_km_many(lat: float, lon: float, lats: "np.ndarray", lons: "np.ndarray") -> "np.ndarray":
+    """Distances in km from one point to arrays of points (degrees), vectorized"""
+    import numpy as np  # deferred: only the array paths need it
+
+    p1 = math.radians(lat)
+    p2 = np.radians(lats)
+    dp = p2 - p1
+    dl = np.radians(lons) - math.radians(lon)
+    a = np.sin(dp / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
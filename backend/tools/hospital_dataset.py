@@ -0,0 +1,163 @@
+"""Offline hospital dataset: build once, then answer nearest-k queries locally.
+
+    python -m tools.hospital_dataset build hospitals.csv data/hospitals
+    python -m tools.hospital_dataset query data/hospitals 40.7128 -74.0060
+
+The build step sorts the records by latitude and writes:
+  lat.npy, lon.npy   float64 coordinates (degrees), sorted by latitude
+  offsets.npy        int64 byte offsets of each record in records.jsonl (+ end)
+  records.jsonl      one hospital dict per line, in the same order
+
+At query time everything is memory-mapped. A latitude band around the query
+point is found with a binary search and ranked with vectorized haversine.
+"""
+import os
+import csv
+import sys
+import json
+import math
+import mmap
+import argparse
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from tools.geo import EARTH_RADIUS_KM, haversine_km_many
+
+_LAT_KEYS = ("lat", "latitude", "y")
+_LON_KEYS = ("lng", "lon", "long", "longitude", "x")
+
+def _first(row: Dict, keys, default=None):
+    for k in keys:
+        if row.get(k) not in (None, ""):
+            return row[k]
+    return default
+
+def _number(value, cast=float):
+    try:
+        return cast(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_hospital(row: Dict, lat: float, lon: float, n: int) -> Dict:
+    place_id = _first(row, ("place_id", "id")) or f"offline:{n}"
+    if str(place_id).startswith("offline:"):
+        maps_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
+    else:
+        maps_url = f"https://www.google.com/maps/place/?q=place_id:{place_id}"
+    return {
+        "name": _first(row, ("name", "title")),
+        "address": _first(row, ("address", "vicinity", "addr")),
+        "rating": _number(row.get("rating")),
+        "user_ratings_total": _number(row.get("user_ratings_total"), int),
+        "location": {"lat": lat, "lng": lon},
+        "place_id": str(place_id),
+        "maps_url": maps_url,
+        "open_now": None,  # opening hours are not part of static datasets
+    }
+
+def read_csv(path: str) -> Iterable[Dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {k.strip().lower(): v for k, v in row.items() if k}
+
+def read_geojson(path: str) -> Iterable[Dict]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") != "Point":
+            continue
+        lon, lat = geometry["coordinates"][:2]
+        row = {k.lower(): v for k, v in (feature.get("properties") or {}).items()}
+        row.setdefault("id", feature.get("id"))
+        row["lat"], row["lng"] = lat, lon
+        yield row
+
+def build(src: str, out_dir: str) -> int:
+    rows = read_geojson(src) if src.lower().endswith((".geojson", ".json")) else read_csv(src)
+    hospitals = []
+    for n, row in enumerate(rows):
+        lat = _number(_first(row, _LAT_KEYS))
+        lon = _number(_first(row, _LON_KEYS))
+        if lat is None or lon is None or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+            continue
+        hospitals.append(_to_hospital(row, lat, lon, n))
+    hospitals.sort(key=lambda h: h["location"]["lat"])
+
+    os.makedirs(out_dir, exist_ok=True)
+    offsets = [0]
+    with open(os.path.join(out_dir, "records.jsonl"), "wb") as f:
+        for h in hospitals:
+            line = json.dumps(h, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(out_dir, "lat.npy"), np.array([h["location"]["lat"] for h in hospitals], dtype=np.float64))
+    np.save(os.path.join(out_dir, "lon.npy"), np.array([h["location"]["lng"] for h in hospitals], dtype=np.float64))
+    np.save(os.path.join(out_dir, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    return len(hospitals)
+
+class OfflineHospitalIndex:
+    """Memory-mapped, latitude-sorted hospital arrays built by `build()`"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lat = np.load(os.path.join(path, "lat.npy"), mmap_mode="r")
+        self.lon = np.load(os.path.join(path, "lon.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._file = open(os.path.join(path, "records.jsonl"), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._records = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def record(self, i: int) -> Dict:
+        return json.loads(self._records[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def nearest(self, latitude: float, longitude: float, radius_m: int, k: int) -> List[Dict]:
+        radius_km = radius_m / 1000
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lo, hi = np.searchsorted(self.lat, [latitude - dlat, latitude + dlat], side="left")
+        if hi <= lo:
+            return []
+        dist = haversine_km_many(latitude, longitude, self.lat[lo:hi], self.lon[lo:hi])
+        within = np.flatnonzero(dist <= radius_km)
+        if len(within) > k:
+            within = within[np.argpartition(dist[within], k - 1)[:k]]
+        within = within[np.argsort(dist[within], kind="stable")]
+        return [dict(self.record(lo + i), distance_km=round(float(dist[i]), 3)) for i in within]
+
+_indexes: Dict[str, OfflineHospitalIndex] = {}
+
+def load(path: str) -> OfflineHospitalIndex:
+    """Open (once per process) the dataset built at `path`"""
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = OfflineHospitalIndex(path)
+    return index
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline hospital dataset tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build the index from a CSV or GeoJSON file")
+    b.add_argument("src")
+    b.add_argument("out_dir")
+    q = sub.add_parser("query", help="print the nearest hospitals to a point")
+    q.add_argument("path")
+    q.add_argument("lat", type=float)
+    q.add_argument("lon", type=float)
+    q.add_argument("--radius-m", type=int, default=5000)
+    q.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        n = build(args.src, args.out_dir)
+        print(f"✅ Indexed {n} hospitals into {args.out_dir}")
+    else:
+        for h in load(args.path).nearest(args.lat, args.lon, args.radius_m, args.k):
+            print(json.dumps(h, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,37 +1,320 @@
 import os
-import httpx
-from typing import List, Dict
+import math
+import time
+import asyncio
+import threading
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 
-PLACES_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+from cache import TTLCache, make_cache
+from metrics import track
+from resilience import Upstream, CircuitOpenError, UpstreamStatusError
+from singleflight import SingleFlight
+from tools.client import get_client, timeout_for, read_timeout_for
+from tools.geo import haversine_km_many, grid_cell
 
-async def nearby_hospitals(latitude: float, longitude: float, radius_m: int = 5000, max_results: int = 5) -> List[Dict]:
+if TYPE_CHECKING:
+    import httpx
+
+PLACES_URL = os.getenv("PLACES_URL", "https://maps.googleapis.com/maps/api/place/nearbysearch/json")
+
+# Places results are merged into a grid-bucketed index (HOSPITAL_CELL_DEG
+# buckets), so later queries near them are answered locally and ranked by
+# distance from the caller.
+HOSPITAL_CELL_DEG = float(os.getenv("HOSPITAL_CELL_DEG", "0.02"))
+HOSPITAL_CACHE_TTL_S = float(os.getenv("HOSPITAL_CACHE_TTL_S", "600"))
+HOSPITAL_CACHE_MAX_CELLS = int(os.getenv("HOSPITAL_CACHE_MAX_CELLS", "5000"))
+HOSPITAL_INDEX_MAX = int(os.getenv("HOSPITAL_INDEX_MAX", "50000"))
+
+# Where hospitals come from: "google" (Places API), "offline" (a dataset built
+# with `python -m tools.hospital_dataset build`), or "auto", which uses the
+# offline dataset when HOSPITAL_DATASET is set and no Maps key is configured.
+HOSPITAL_PROVIDER = (os.getenv("HOSPITAL_PROVIDER") or "auto").lower()
+HOSPITAL_DATASET = os.getenv("HOSPITAL_DATASET")
+# Hedged Places requests are billed twice, so they are opt-in
+PLACES_HEDGE = (os.getenv("PLACES_HEDGE") or "").lower() in ("1", "true", "yes")
+
+# Ring search: Places is queried at the smallest radius first and the search
+# widens only while fewer than the requested number of hospitals are known
+# within the ring. Within a ring, further result pages (next_page_token) are
+# fetched only when the earlier ones weren't enough, up to HOSPITAL_MAX_PAGES.
+HOSPITAL_SEARCH_RADII_M = sorted(
+    int(r) for r in (os.getenv("HOSPITAL_SEARCH_RADII_M") or "2000,5000,15000,50000").split(",") if r.strip()
+)
+HOSPITAL_MAX_PAGES = int(os.getenv("HOSPITAL_MAX_PAGES", "3"))
+HOSPITAL_OPEN_NOW = (os.getenv("HOSPITAL_OPEN_NOW") or "true").lower() not in ("0", "false", "no")
+# A ring query is shared by every caller in its coverage cell, which is
+# RING_CELL_FRACTION of the ring radius across. The query may have been made
+# up to a cell diagonal away, so for other callers only hospitals within the
+# ring minus that diagonal are known to be covered; the search widens until
+# enough of those are found (the last ring answers with what it has).
+RING_CELL_FRACTION = 0.25
+# Places only accepts a next_page_token a short while after issuing it
+PLACES_PAGE_DELAY_S = float(os.getenv("PLACES_PAGE_DELAY_S", "2"))
+
+# Places reports errors in `status` with HTTP 200; these ones are the
+# upstream's fault (quota, transient) and count against the breaker
+PLACES_FAILURE_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+KM_PER_DEG_LAT = 111.32
+
+class HospitalIndex:
+    """Grid-bucketed spatial index of hospitals seen in Places results"""
+
+    def __init__(self, cell_deg: float, ttl: float, max_entries: int):
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # cell -> place_id -> (expires_at, hospital)
+        self._buckets: Dict[Tuple[int, int], Dict[str, Tuple[float, Dict]]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, hospitals: List[Dict], ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for h in hospitals:
+                loc = h.get("location") or {}
+                if loc.get("lat") is None or loc.get("lng") is None or not h.get("place_id"):
+                    continue
+                bucket = self._buckets.setdefault(grid_cell(loc["lat"], loc["lng"], self.cell_deg), {})
+                if h["place_id"] not in bucket:
+                    self._size += 1
+                bucket[h["place_id"]] = (expires_at, h)
+            if self._size > self.max_entries:
+                self._prune_locked()
+
+    def nearest(self, lat: float, lon: float, radius_m: int, k: int, stale_ok: bool = False) -> List[Dict]:
+        """Up to k hospitals within radius_m, nearest first, each with its distance_km"""
+        import numpy as np  # deferred, as in geo.haversine_km_many
+
+        radius_km = radius_m / 1000
+        span_lat = math.ceil(radius_km / KM_PER_DEG_LAT / self.cell_deg)
+        km_per_deg_lon = max(KM_PER_DEG_LAT * math.cos(math.radians(lat)), 1e-6)
+        # near the poles the ring can wrap the whole circle of longitude
+        span_lon = min(math.ceil(radius_km / km_per_deg_lon / self.cell_deg), math.ceil(180 / self.cell_deg))
+        ci, cj = grid_cell(lat, lon, self.cell_deg)
+
+        now = time.time()
+        candidates = []
+        with self._lock:
+            for i in range(ci - span_lat, ci + span_lat + 1):
+                for j in range(cj - span_lon, cj + span_lon + 1):
+                    bucket = self._buckets.get((i, j))
+                    if not bucket:
+                        continue
+                    for expires_at, h in bucket.values():
+                        if expires_at >= now or stale_ok:
+                            candidates.append(h)
+        if not candidates:
+            return []
+
+        dist = haversine_km_many(lat, lon, np.array([h["location"]["lat"] for h in candidates]),
+                                 np.array([h["location"]["lng"] for h in candidates]))
+        within = np.flatnonzero(dist <= radius_km)
+        within = within[np.argsort(dist[within], kind="stable")[:k]]
+        return [dict(candidates[i], distance_km=round(float(dist[i]), 3)) for i in within]
+
+    def _prune_locked(self) -> None:
+        now = time.time()
+        entries = []
+        for cell, bucket in self._buckets.items():
+            for place_id, (expires_at, _) in bucket.items():
+                entries.append((expires_at, cell, place_id))
+        entries.sort()
+        # drop expired entries, then the oldest ones until back under the cap
+        overflow = max(len(entries) - self.max_entries, 0)
+        for n, (expires_at, cell, place_id) in enumerate(entries):
+            if expires_at >= now and n >= overflow:
+                break
+            del self._buckets[cell][place_id]
+            self._size -= 1
+        self._buckets = {c: b for c, b in self._buckets.items() if b}
+
+# (query cell, ring radius) -> {"hospitals", "pages", "next_page_token",
+# "token_at"} for the Places pages fetched so far. With a shared CACHE_BACKEND
+# other workers' results land here too; each worker merges a coverage entry
+# into its own index when it first sees it or it has grown (_merged).
+_coverage = make_cache("hospitals", maxsize=HOSPITAL_CACHE_MAX_CELLS, ttl=HOSPITAL_CACHE_TTL_S)
+_merged = TTLCache("hospitals_merged", maxsize=HOSPITAL_CACHE_MAX_CELLS, ttl=HOSPITAL_CACHE_TTL_S)
+_search = {"widened": 0, "next_pages": 0}
+_index = HospitalIndex(HOSPITAL_CELL_DEG, HOSPITAL_CACHE_TTL_S, HOSPITAL_INDEX_MAX)
+_flight = SingleFlight("places")
+_upstream = Upstream("places", read_timeout_for(PLACES_URL), hedge=PLACES_HEDGE)
+
+def cache_stats() -> dict:
+    stats = _coverage.stats()
+    stats["indexed_places"] = len(_index)
+    stats.update(_search)
+    return stats
+
+def flight_stats() -> dict:
+    return _flight.stats()
+
+def breaker_stats() -> dict:
+    return _upstream.stats()
+
+def _to_hospital(place: Dict) -> Dict:
+    return {
+        "name": place.get("name"),
+        "address": place.get("vicinity"),
+        "rating": place.get("rating"),
+        "user_ratings_total": place.get("user_ratings_total"),
+        "location": place.get("geometry", {}).get("location"),
+        "place_id": place.get("place_id"),
+        "maps_url": f"https://www.google.com/maps/place/?q=place_id:{place.get('place_id')}",
+        "open_now": place.get("opening_hours", {}).get("open_now"),
+    }
+
+async def _fetch_places(coverage_key, latitude: float, longitude: float, radius_m: int,
+                        client: Optional["httpx.AsyncClient"] = None, timeout_s: Optional[float] = None,
+                        entry: Optional[Dict] = None) -> Dict:
+    """Fetch the first Places page for a ring, or the next page of `entry`"""
     api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     if not api_key:
         raise RuntimeError("GOOGLE_MAPS_API_KEY not set")
 
-    params = {
-        "key": api_key,
-        "location": f"{latitude},{longitude}",
-        "radius": radius_m,
-        "type": "hospital",
-        "opennow": "true",
-    }
+    if entry is None:
+        entry = {"hospitals": [], "pages": 0, "next_page_token": None, "token_at": 0.0,
+                 "origin": (latitude, longitude)}
+        params = {
+            "key": api_key,
+            "location": f"{latitude},{longitude}",
+            "radius": radius_m,
+            "type": "hospital",
+        }
+        if HOSPITAL_OPEN_NOW:
+            params["opennow"] = "true"
+    else:
+        params = {"key": api_key, "pagetoken": entry["next_page_token"]}
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(PLACES_URL, params=params)
+    client = client or get_client()
+    with track("places"):
+        r = await client.get(PLACES_URL, params=params, timeout=timeout_for(PLACES_URL, timeout_s))
         r.raise_for_status()
-        data = r.json()
-
-    out = []
-    for place in data.get("results", [])[:max_results]:
-        out.append({
-            "name": place.get("name"),
-            "address": place.get("vicinity"),
-            "rating": place.get("rating"),
-            "user_ratings_total": place.get("user_ratings_total"),
-            "location": place.get("geometry", {}).get("location"),
-            "place_id": place.get("place_id"),
-            "maps_url": f"https://www.google.com/maps/place/?q=place_id:{place.get('place_id')}",
-            "open_now": place.get("opening_hours", {}).get("open_now"),
-        })
-    return out
+    data = r.json()
+
+    status = data.get("status", "OK")
+    if status == "INVALID_REQUEST" and entry is not None:
+        # an expired or not-yet-valid page token just ends the pagination
+        data = {}
+    elif status not in ("OK", "ZERO_RESULTS"):
+        # raised, not cached: an error must not read as "no hospitals here"
+        raise UpstreamStatusError("places", status, failure=status in PLACES_FAILURE_STATUSES)
+
+    hospitals = [_to_hospital(place) for place in data.get("results", [])]
+    token = data.get("next_page_token")
+    entry = {
+        "hospitals": entry["hospitals"] + hospitals,
+        "pages": entry["pages"] + 1,
+        "next_page_token": token,
+        "token_at": time.time(),
+        "origin": entry.get("origin"),
+    }
+    _index.add(hospitals)
+    await _coverage.aset(coverage_key, entry)
+    _merged.set(coverage_key, len(entry["hospitals"]))
+    return entry
+
+def _merge(coverage_key, entry: Dict, age: float) -> None:
+    if _merged.get(coverage_key) != len(entry["hospitals"]):
+        _index.add(entry["hospitals"], ttl=HOSPITAL_CACHE_TTL_S - age)
+        _merged.set(coverage_key, len(entry["hospitals"]))
+
+async def _ring_page(coverage_key, latitude: float, longitude: float, radius_m: int,
+                     client: Optional["httpx.AsyncClient"], entry: Optional[Dict] = None) -> Dict:
+    # concurrent lookups from the same cell share one Places request per page
+    if entry is not None:
+        await asyncio.sleep(max(entry["token_at"] + PLACES_PAGE_DELAY_S - time.time(), 0))
+        current = await _coverage.aget(coverage_key)
+        if current is not None and current["pages"] > entry["pages"]:
+            return current  # another caller already fetched this page
+    pages = entry["pages"] if entry is not None else 0
+    fetch = lambda timeout_s: _fetch_places(coverage_key, latitude, longitude, radius_m, client, timeout_s, entry)
+    return await _flight.do((coverage_key, pages), lambda: _upstream.call(fetch))
+
+def _ring_cell(latitude: float, longitude: float, ring_m: int) -> Tuple[int, int]:
+    return grid_cell(latitude, longitude, ring_m * RING_CELL_FRACTION / 1000 / KM_PER_DEG_LAT)
+
+def _covered_m(entry: Dict, latitude: float, longitude: float, ring_m: int) -> float:
+    """Radius around the caller within which the ring's query saw every hospital Places returned"""
+    origin = entry.get("origin")
+    if origin is not None and tuple(origin) == (latitude, longitude):
+        return ring_m
+    # a cell is at most ring * RING_CELL_FRACTION km across in each direction
+    return ring_m * (1 - RING_CELL_FRACTION * math.sqrt(2))
+
+def _rings(radius_m: Optional[int]) -> List[int]:
+    if radius_m is None:
+        return HOSPITAL_SEARCH_RADII_M
+    return [r for r in HOSPITAL_SEARCH_RADII_M if r < radius_m] + [radius_m]
+
+async def _google_nearby(latitude: float, longitude: float, radius_m: Optional[int], max_results: int,
+                         client: Optional["httpx.AsyncClient"] = None) -> List[Dict]:
+    rings = _rings(radius_m)
+    found: List[Dict] = []
+    entry = None
+    for n, ring in enumerate(rings):
+        if n:
+            _search["widened"] += 1
+        coverage_key = (_ring_cell(latitude, longitude, ring), ring)
+        try:
+            cached = await _coverage.aget_with_age(coverage_key)
+            if cached is not None:
+                entry, age = cached
+                _merge(coverage_key, entry, age)
+            else:
+                entry = await _ring_page(coverage_key, latitude, longitude, ring, client)
+            radius = ring if n == len(rings) - 1 else _covered_m(entry, latitude, longitude, ring)
+            found = _index.nearest(latitude, longitude, radius, max_results)
+            while len(found) < max_results and entry["next_page_token"] and entry["pages"] < HOSPITAL_MAX_PAGES:
+                _search["next_pages"] += 1
+                entry = await _ring_page(coverage_key, latitude, longitude, ring, client, entry)
+                found = _index.nearest(latitude, longitude, radius, max_results)
+        except CircuitOpenError:
+            # Places is failing: answer from whatever is indexed, even if expired
+            return _index.nearest(latitude, longitude, rings[-1], max_results, stale_ok=True)
+        except Exception:
+            if entry is None:
+                raise  # nothing fetched yet, so there is nothing to fall back on
+            # a wider ring or a further page failed: keep what the earlier ones found
+            return found or _index.nearest(latitude, longitude, rings[-1], max_results)
+        if len(found) >= max_results:
+            break
+    return found
+
+async def _offline_nearby(latitude: float, longitude: float, radius_m: Optional[int], max_results: int,
+                          client: Optional["httpx.AsyncClient"] = None) -> List[Dict]:
+    if not HOSPITAL_DATASET:
+        raise RuntimeError("HOSPITAL_DATASET not set")
+    from tools import hospital_dataset  # numpy-backed; only needed by this provider
+    radius_m = radius_m or HOSPITAL_SEARCH_RADII_M[-1]  # one indexed query covers every ring
+    return hospital_dataset.load(HOSPITAL_DATASET).nearest(latitude, longitude, radius_m, max_results)
+
+PROVIDERS = {
+    "google": _google_nearby,
+    "offline": _offline_nearby,
+}
+
+def provider_name() -> str:
+    if HOSPITAL_PROVIDER != "auto":
+        return HOSPITAL_PROVIDER
+    if HOSPITAL_DATASET and not os.getenv("GOOGLE_MAPS_API_KEY"):
+        return "offline"
+    return "google"
+
+def warm_up() -> None:
+    """Open (memory-map) the offline dataset ahead of the first request when it is in use"""
+    if provider_name() == "offline" and HOSPITAL_DATASET:
+        from tools import hospital_dataset
+        hospital_dataset.load(HOSPITAL_DATASET)
+
+async def nearby_hospitals(latitude: float, longitude: float, radius_m: Optional[int] = None, max_results: int = 5,
+                          client: Optional["httpx.AsyncClient"] = None) -> List[Dict]:
+    """Nearest hospitals, closest first with distance_km; radius_m caps the search (default: widest ring)"""
+    provider = PROVIDERS.get(provider_name())
+    if provider is None:
+        raise RuntimeError(f"Unknown HOSPITAL_PROVIDER: {HOSPITAL_PROVIDER}")
+    return await provider(latitude, longitude, radius_m, max_results, client)
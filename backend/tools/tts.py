@@ -1,9 +1,27 @@
 # tools/tts.py - Fixed version
 import os
 import re
-from openai import OpenAI
+import asyncio
+import operator
+from typing import AsyncIterator, List, Optional
+
+from tools import audio_cache
+from metrics import track
+
+TTS_MODEL = "tts-1"
+TTS_FORMAT = "mp3"
+TTS_STREAM_CHUNK_BYTES = int(os.getenv("TTS_STREAM_CHUNK_BYTES", "16384"))
+
+# Long texts are split at sentence boundaries and synthesized concurrently.
+# The first chunk is kept short so audio starts after roughly one sentence.
+TTS_FIRST_CHUNK_CHARS = int(os.getenv("TTS_FIRST_CHUNK_CHARS", "200"))
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "1000"))  # OpenAI TTS input limit is 4096
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
 
 _client = None
+_async_client = None
 
 def _client_once():
     global _client
@@ -11,86 +29,240 @@ def _client_once():
         key = os.getenv("OPENAI_API_KEY")
         if not key:
             raise RuntimeError("OPENAI_API_KEY not set in environment variables")
+        from openai import OpenAI  # imported on first use: it adds ~1s to worker startup
         _client = OpenAI(api_key=key)
     return _client
 
+def _async_client_once():
+    global _async_client
+    if _async_client is None:
+        key = os.getenv("OPENAI_API_KEY")
+        if not key:
+            raise RuntimeError("OPENAI_API_KEY not set in environment variables")
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI(api_key=key)
+    return _async_client
+
+def warm_up() -> None:
+    """Import openai and build the async client ahead of the first /tts request"""
+    if os.getenv("OPENAI_API_KEY"):
+        _async_client_once()
+
+# Text normalizer for TTS, compiled once at import. Passes are skipped when
+# their trigger substring is absent, and newline/bullet/whitespace handling
+# uses str methods instead of regex scans. Output is identical to the original
+# pass-by-pass version; benchmarks/tts_normalizer.py checks it against a
+# golden corpus.
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_HEADER_RE = re.compile(r'#{1,6}\s*')
+_URL_RE = re.compile(r'https?://[^\s]+')
+_LINK_RE = re.compile(r'\[([^\]]+)\]\([^\)]+\)')
+_BULLETS = '•▪▫‣⁃'
+_group1 = operator.itemgetter(1)
+
+# Replace symbols and emojis for better pronunciation (applied in this order)
+_REPLACEMENTS = (
+    ('🚨', 'Alert: '),
+    ('🏥', 'Medical: '),
+    ('📞', 'Contact: '),
+    ('⚠️', 'Warning: '),
+    ('🔍', 'Analysis: '),
+    ('👁️', 'Watch for: '),
+    ('🚫', 'Do not: '),
+    ('⏱️', 'Time: '),
+    ('🩹', 'Self-care: '),
+    ('🌡️', 'Weather: '),
+    ('📍', 'Location: '),
+    ('🗺️', 'Maps: '),
+    ('💡', 'Note: '),
+    ('⚕️', 'Medical: '),
+    ('N/A', 'not available'),
+    ('★', ' stars'),
+    ('%', ' percent'),
+    ('Dr.', 'Doctor'),
+    ('St.', 'Street'),
+    ('Ave.', 'Avenue'),
+    ('Rd.', 'Road'),
+    ('vs.', 'versus'),
+    ('etc.', 'etcetera'),
+    ('°C', ' degrees Celsius'),
+    ('°F', ' degrees Fahrenheit'),
+)
+
+def _newlines_to_periods(text: str) -> str:
+    # Same as re.sub(r'\n+', '. ', text)
+    parts = text.split('\n')
+    inner = '. '.join(p for p in parts if p)
+    if not inner:
+        return '. '
+    return ('' if parts[0] else '. ') + inner + ('' if parts[-1] else '. ')
+
 def clean_text_for_tts(text: str) -> str:
     """Clean text for better TTS pronunciation"""
     # Remove markdown formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Remove **bold**
-    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Remove *italic*
-    text = re.sub(r'#{1,6}\s*', '', text)         # Remove headers
-    text = re.sub(r'[•▪▫‣⁃]', ' ', text)          # Convert bullets to spaces
-    text = re.sub(r'\n+', '. ', text)             # Replace newlines with periods
-    text = re.sub(r'\s+', ' ', text)              # Normalize whitespace
-    
-    # Replace symbols and emojis for better pronunciation
-    replacements = {
-        '🚨': 'Alert: ',
-        '🏥': 'Medical: ',
-        '📞': 'Contact: ',
-        '⚠️': 'Warning: ',
-        '🔍': 'Analysis: ',
-        '👁️': 'Watch for: ',
-        '🚫': 'Do not: ',
-        '⏱️': 'Time: ',
-        '🩹': 'Self-care: ',
-        '🌡️': 'Weather: ',
-        '📍': 'Location: ',
-        '🗺️': 'Maps: ',
-        '💡': 'Note: ',
-        '⚕️': 'Medical: ',
-        'N/A': 'not available',
-        '★': ' stars',
-        '%': ' percent',
-        'Dr.': 'Doctor',
-        'St.': 'Street',
-        'Ave.': 'Avenue',
-        'Rd.': 'Road',
-        'vs.': 'versus',
-        'etc.': 'etcetera',
-        '°C': ' degrees Celsius',
-        '°F': ' degrees Fahrenheit'
-    }
-    
-    for symbol, replacement in replacements.items():
+    if '*' in text:
+        text = _BOLD_RE.sub(_group1, text)    # Remove **bold**
+        text = _ITALIC_RE.sub(_group1, text)  # Remove *italic*
+    if '#' in text:
+        text = _HEADER_RE.sub('', text)       # Remove headers
+    for bullet in _BULLETS:                   # Convert bullets to spaces
+        if bullet in text:
+            text = text.replace(bullet, ' ')
+    if '\n' in text:
+        text = _newlines_to_periods(text)     # Replace newlines with periods
+    # Normalize whitespace. Unlike re.sub(r'\s+', ' '), this also drops leading
+    # and trailing whitespace, which the final strip() removes anyway.
+    text = ' '.join(text.split())
+
+    for symbol, replacement in _REPLACEMENTS:
         text = text.replace(symbol, replacement)
-    
+
     # Remove URLs and markdown links
-    text = re.sub(r'https?://[^\s]+', 'web link', text)
-    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
-    
+    if '://' in text:
+        text = _URL_RE.sub('web link', text)
+    if '](' in text:
+        text = _LINK_RE.sub(_group1, text)
+
     return text.strip()
 
-def tts_to_mp3_bytes(text: str, voice: str = "alloy") -> bytes:
-    """Convert text to MP3 bytes using OpenAI TTS"""
-    client = _client_once()
-    
+def prepare_tts_text(text: str) -> str:
     # Clean and prepare text
     clean_text = clean_text_for_tts(text)
     
-    # OpenAI TTS has a 4096 character limit
-    if len(clean_text) > 4000:
-        clean_text = clean_text[:4000] + "... Assessment truncated for audio."
-    
     if not clean_text.strip():
         raise ValueError("No text content to convert to speech")
+    return clean_text
+
+def _split_long(sentence: str, limit: int) -> List[str]:
+    parts, cur = [], ""
+    for word in sentence.split(" "):
+        while len(word) > limit:
+            if cur:
+                parts.append(cur)
+                cur = ""
+            parts.append(word[:limit])
+            word = word[limit:]
+        if cur and len(cur) + 1 + len(word) > limit:
+            parts.append(cur)
+            cur = word
+        else:
+            cur = f"{cur} {word}" if cur else word
+    if cur:
+        parts.append(cur)
+    return parts
+
+def split_tts_chunks(clean_text: str, first_limit: int = TTS_FIRST_CHUNK_CHARS,
+                     limit: int = TTS_CHUNK_CHARS) -> List[str]:
+    """Group sentences into chunks of at most `limit` chars (`first_limit` for the first one)"""
+    chunks, cur = [], ""
+    for sentence in _SENTENCE_END.split(clean_text.strip()):
+        if not sentence:
+            continue
+        cap = first_limit if not chunks else limit
+        if cur and len(cur) + 1 + len(sentence) > cap:
+            chunks.append(cur)
+            cur = ""
+            cap = limit
+        if len(sentence) > cap:
+            pieces = _split_long(sentence, cap)
+            chunks.extend(([cur] if cur else []) + pieces[:-1])
+            cur = pieces[-1]
+        else:
+            cur = f"{cur} {sentence}" if cur else sentence
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+def _strip_id3(data: bytes) -> bytes:
+    """Drop a leading ID3v2 tag so MP3 segments can be concatenated frame to frame"""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return data[10 + size:]
+    return data
+
+def tts_to_mp3_bytes(text: str, voice: str = "alloy") -> bytes:
+    """Convert text to MP3 bytes using OpenAI TTS"""
+    client = _client_once()
+    clean_text = prepare_tts_text(text)
     
     try:
-        # Use the correct model name for OpenAI TTS
-        resp = client.audio.speech.create(
-            model="tts-1",  # ✅ Correct model name (was "gpt-4o-mini-tts")
-            voice=voice,    # alloy, echo, fable, onyx, nova, shimmer
-            input=clean_text,
-            response_format="mp3"
-        )
+        audio = []
+        for i, chunk in enumerate(split_tts_chunks(clean_text, TTS_CHUNK_CHARS)):
+            # Use the correct model name for OpenAI TTS
+            with track("tts"):
+                resp = client.audio.speech.create(
+                    model=TTS_MODEL,  # ✅ Correct model name (was "gpt-4o-mini-tts")
+                    voice=voice,    # alloy, echo, fable, onyx, nova, shimmer
+                    input=chunk,
+                    response_format="mp3"
+                )
+            audio.append(resp.content if i == 0 else _strip_id3(resp.content))
         
         # Return the audio content
-        return resp.content
+        return b"".join(audio)
         
     except Exception as e:
         raise RuntimeError(f"TTS generation failed: {str(e)}")
 
+def cached_audio_path(clean_text: str, voice: str = "alloy") -> Optional[str]:
+    """Path of previously synthesized audio for this text and voice, if cached"""
+    return audio_cache.lookup(audio_cache.audio_key(clean_text, voice, TTS_MODEL, TTS_FORMAT), TTS_FORMAT)
+
+async def _synthesize_chunk(client, text: str, voice: str, strip_tag: bool,
+                            out: asyncio.Queue, sem: asyncio.Semaphore):
+    try:
+        async with sem:
+            with track("tts"):
+                async with client.audio.speech.with_streaming_response.create(
+                    model=TTS_MODEL,
+                    voice=voice,
+                    input=text,
+                    response_format=TTS_FORMAT,
+                ) as resp:
+                    first = True
+                    async for data in resp.iter_bytes(TTS_STREAM_CHUNK_BYTES):
+                        if first and strip_tag:
+                            data = _strip_id3(data)
+                        first = False
+                        await out.put(data)
+        await out.put(None)
+    except Exception as e:
+        await out.put(e)
+
+async def synthesize_stream(clean_text: str, voice: str = "alloy") -> AsyncIterator[bytes]:
+    """Stream MP3 for already-cleaned text, saving a complete stream to the audio cache.
+
+    Sentence chunks are synthesized concurrently (at most TTS_CONCURRENCY at a
+    time) and forwarded in order; the first chunk streams as soon as it arrives
+    while later ones buffer until their turn.
+    """
+    client = _async_client_once()
+    writer = audio_cache.AudioWriter(audio_cache.audio_key(clean_text, voice, TTS_MODEL, TTS_FORMAT), TTS_FORMAT)
+    sem = asyncio.Semaphore(TTS_CONCURRENCY)
+    chunks = split_tts_chunks(clean_text)
+    queues = [asyncio.Queue() for _ in chunks]
+    tasks = [
+        asyncio.create_task(_synthesize_chunk(client, text, voice, i > 0, queues[i], sem))
+        for i, text in enumerate(chunks)
+    ]
+
+    try:
+        for queue in queues:
+            while True:
+                data = await queue.get()
+                if data is None:
+                    break
+                if isinstance(data, Exception):
+                    raise RuntimeError(f"TTS generation failed: {str(data)}")
+                writer.write(data)
+                yield data
+        await writer.commit()
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer.abort()
+
 def test_tts():
     """Test TTS functionality"""
     try:
@@ -1,18 +1,61 @@
 import os
-import httpx
+import asyncio
+from typing import TYPE_CHECKING, Optional
 
-OW_URL = "https://api.openweathermap.org/data/2.5/weather"
+from cache import make_cache
+from metrics import track
+from resilience import Upstream, CircuitOpenError
+from singleflight import SingleFlight
+from tools.client import get_client, timeout_for, read_timeout_for
 
-async def current_weather(lat: float, lon: float):
+if TYPE_CHECKING:
+    import httpx
+
+OW_URL = os.getenv("OW_URL", "https://api.openweathermap.org/data/2.5/weather")
+
+# Weather is cached per coarse grid point (0.1 deg ~ 11 km). Entries younger
+# than WEATHER_FRESH_S are served as-is; older ones (up to WEATHER_MAX_STALE_S)
+# are served immediately while a background task refreshes them.
+WEATHER_GRID_DECIMALS = int(os.getenv("WEATHER_GRID_DECIMALS", "1"))
+WEATHER_FRESH_S = float(os.getenv("WEATHER_FRESH_S", "600"))
+WEATHER_MAX_STALE_S = float(os.getenv("WEATHER_MAX_STALE_S", "3600"))
+WEATHER_CACHE_MAX = int(os.getenv("WEATHER_CACHE_MAX", "10000"))
+OPENWEATHER_HEDGE = (os.getenv("OPENWEATHER_HEDGE") or "").lower() in ("1", "true", "yes")
+
+# Cached summaries are stored as plain tuples in this field order
+_FIELDS = ("summary", "description", "temp_c", "feels_like_c", "humidity_pct", "wind_mps")
+
+_cache = make_cache("weather", maxsize=WEATHER_CACHE_MAX, ttl=WEATHER_MAX_STALE_S)
+_refreshing = {}  # grid key -> background refresh task
+_flight = SingleFlight("openweather")
+_upstream = Upstream("openweather", read_timeout_for(OW_URL), hedge=OPENWEATHER_HEDGE)
+
+def cache_stats() -> dict:
+    stats = _cache.stats()
+    stats["refreshing"] = len(_refreshing)
+    return stats
+
+def flight_stats() -> dict:
+    return _flight.stats()
+
+def breaker_stats() -> dict:
+    return _upstream.stats()
+
+def _grid_key(lat: float, lon: float):
+    return (round(lat, WEATHER_GRID_DECIMALS), round(lon, WEATHER_GRID_DECIMALS))
+
+async def _fetch(lat: float, lon: float, client: Optional["httpx.AsyncClient"] = None,
+                 timeout_s: Optional[float] = None) -> tuple:
     api_key = os.getenv("OPENWEATHER_API_KEY")
     if not api_key:
         raise RuntimeError("OPENWEATHER_API_KEY not set")
 
     params = {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(OW_URL, params=params)
+    client = client or get_client()
+    with track("openweather"):
+        r = await client.get(OW_URL, params=params, timeout=timeout_for(OW_URL, timeout_s))
         r.raise_for_status()
-        j = r.json()
+    j = r.json()
     # small curated summary
     main = j.get("weather", [{}])[0].get("main")
     desc = j.get("weather", [{}])[0].get("description")
@@ -20,11 +63,29 @@ async def current_weather(lat: float, lon: float):
     feels = j.get("main", {}).get("feels_like")
     humidity = j.get("main", {}).get("humidity")
     wind = j.get("wind", {}).get("speed")
-    return {
-        "summary": main,
-        "description": desc,
-        "temp_c": temp,
-        "feels_like_c": feels,
-        "humidity_pct": humidity,
-        "wind_mps": wind,
-    }
+    return (main, desc, temp, feels, humidity, wind)
+
+async def _refresh(key, lat: float, lon: float):
+    try:
+        await _cache.aset(key, await _flight.do(key, lambda: _upstream.call(lambda t: _fetch(lat, lon, timeout_s=t))))
+    except Exception:
+        pass  # keep serving the stale entry; the next request retries
+    finally:
+        _refreshing.pop(key, None)
+
+async def current_weather(lat: float, lon: float, client: Optional["httpx.AsyncClient"] = None):
+    key = _grid_key(lat, lon)
+    found = await _cache.aget_with_age(key)
+    if found is not None:
+        summary, age = found
+        if age > WEATHER_FRESH_S and key not in _refreshing:
+            _refreshing[key] = asyncio.create_task(_refresh(key, *key))
+        return dict(zip(_FIELDS, summary))
+
+    # concurrent misses for the same grid point share one request
+    try:
+        summary = await _flight.do(key, lambda: _upstream.call(lambda t: _fetch(*key, client=client, timeout_s=t)))
+    except CircuitOpenError:
+        return None  # OpenWeather is failing and nothing is cached for this point
+    await _cache.aset(key, summary)
+    return dict(zip(_FIELDS, summary))
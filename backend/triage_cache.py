@@ -0,0 +1,60 @@
+import os
+from typing import Optional
+
+from cache import make_cache
+from models import ConditionAssessment
+
+# Validated triage results keyed on a canonical form of the chain inputs:
+# text fields are whitespace/case normalized and age is bucketed, so repeats
+# that differ only in formatting share one LLM call.
+TRIAGE_CACHE_TTL_S = float(os.getenv("TRIAGE_CACHE_TTL_S", "900"))
+TRIAGE_CACHE_MAX = int(os.getenv("TRIAGE_CACHE_MAX", "2048"))
+
+# Upper bounds (exclusive) of the age buckets; anything above the last is "65+"
+AGE_BUCKETS = (2, 12, 18, 40, 65)
+
+_cache = make_cache("triage", maxsize=TRIAGE_CACHE_MAX, ttl=TRIAGE_CACHE_TTL_S)
+_bypassed = 0
+
+def _norm(value) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+def age_bucket(age) -> str:
+    if age in (None, ""):
+        return ""
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return _norm(age)
+    low = 0
+    for high in AGE_BUCKETS:
+        if age < high:
+            return f"{low}-{high - 1}"
+        low = high
+    return f"{low}+"
+
+def cache_key(inputs: dict) -> tuple:
+    return (
+        _norm(inputs.get("symptoms")),
+        age_bucket(inputs.get("age")),
+        _norm(inputs.get("gender")),
+        _norm(inputs.get("city")),
+        _norm(inputs.get("country")),
+    )
+
+async def get(key: tuple) -> Optional[ConditionAssessment]:
+    # stored as plain data, so every caller gets its own object to mutate
+    cached = await _cache.aget(key)
+    return ConditionAssessment.model_validate(cached) if cached is not None else None
+
+async def put(key: tuple, assessment: ConditionAssessment) -> None:
+    await _cache.aset(key, assessment.model_dump())
+
+def record_bypass() -> None:
+    global _bypassed
+    _bypassed += 1
+
+def stats() -> dict:
+    stats = _cache.stats()
+    stats["bypassed"] = _bypassed
+    return stats
@@ -1,19 +1,44 @@
 # app.py - Final version without STT (Ready for submission)
 import gradio as gr
-import requests
+import httpx
 import tempfile
+import json
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Configuration - matches your backend
-API_BASE = "http://127.0.0.1:8000"
+API_BASE = os.getenv("API_BASE", "http://127.0.0.1:8000")
 
-# Global variable to store last analysis results for map display
-last_analysis_data = {}
+# Assessment fields the backend streams one event at a time
+ASSESSMENT_FIELDS = ("condition_type", "severity", "confidence", "red_flags", "recommended_actions", "self_care_advice")
 
-def speak_text(text):
+# Handlers are async and share one pooled client, so a slow analysis only
+# occupies a queue slot instead of a worker thread. The Gradio queue caps how
+# many events run at once (GRADIO_CONCURRENCY) and how many may wait.
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "32"))
+GRADIO_QUEUE_MAX = int(os.getenv("GRADIO_QUEUE_MAX", "256"))
+BACKEND_TIMEOUT_S = float(os.getenv("BACKEND_TIMEOUT_S", "30"))
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "64"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=API_BASE,
+            timeout=httpx.Timeout(BACKEND_TIMEOUT_S, connect=5),
+            limits=httpx.Limits(
+                max_connections=BACKEND_MAX_CONNECTIONS,
+                max_keepalive_connections=BACKEND_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+async def speak_text(text):
     """Convert text to speech using your backend TTS endpoint"""
     if not text or text.strip() == "":
         return None
@@ -25,23 +50,19 @@ def speak_text(text):
             "voice": "nova"  # Options: alloy, echo, fable, onyx, nova, shimmer
         }
         
-        response = requests.post(
-            f"{API_BASE}/tts", 
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            # Save the audio to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tmp_file.write(response.content)
-                return tmp_file.name
-        else:
-            print(f"TTS Error: {response.status_code} - {response.text}")
-            return None
+        async with get_client().stream("POST", "/tts", json=payload) as response:
+            if response.status_code == 200:
+                # Save the audio to a temporary file as it arrives
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
+                    async for chunk in response.aiter_bytes():
+                        tmp_file.write(chunk)
+                    return tmp_file.name
+            else:
+                await response.aread()
+                print(f"TTS Error: {response.status_code} - {response.text}")
+                return None
             
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print("❌ Cannot connect to TTS service. Make sure backend is running.")
         return None
     except Exception as e:
@@ -79,6 +100,9 @@ def generate_hospital_map_html(hospitals, user_location=None):
             <p style="margin: 5px 0; color: #666;">📍 {address}</p>
         """
         
+        if hospital.get('distance_km') is not None:
+            html += f"<p style=\"margin: 5px 0; color: #666;\">🚗 {hospital['distance_km']:.1f} km away</p>"
+        
         if rating != 'N/A':
             stars = "⭐" * int(float(rating)) if isinstance(rating, (int, float)) else "⭐"
             html += f"<p style=\"margin: 5px 0; color: #666;\">⭐ {rating} {stars}</p>"
@@ -172,12 +196,49 @@ def show_emergency_rooms():
     </div>
     """
 
-def analyze_symptoms(symptoms, age, gender, lat, lon, city, country):
-    """Analyze symptoms using your backend /assist endpoint"""
-    global last_analysis_data
-    
+async def _sse_events(response):
+    """Yield (event, data) pairs from a text/event-stream response"""
+    event, data = "message", []
+    async for line in response.aiter_lines():
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+def _merge_event(data, event, payload):
+    """Fold one /assist/stream event into the assessment dict; returns False for unknown events"""
+    if event in ("provisional", "assessment"):
+        # keep fields already received (e.g. hospitals) when the final object leaves them empty
+        data.update({k: v for k, v in payload.items() if v is not None or k not in data})
+    elif event == "hospitals":
+        data["nearest_hospitals"] = payload
+    elif event == "weather":
+        data["weather_context"] = payload
+    elif event == "partial":
+        # the assessment may already have set "partial" to None
+        data["partial"] = (data.get("partial") or []) + [payload.get("stage")]
+    elif event in ASSESSMENT_FIELDS:
+        data[event] = payload
+    else:
+        return False
+    return True
+
+async def analyze_symptoms(symptoms, age, gender, lat, lon, city, country, analysis):
+    """Analyze symptoms using your backend /assist/stream endpoint.
+
+    A generator: the summary is re-rendered as each event arrives, so
+    severity and red flags show up before the rest of the assessment and
+    hospitals/weather appear as soon as they are found. `analysis` is the
+    session's last result (gr.State), so concurrent users never see each
+    other's data.
+    """
     if not symptoms or symptoms.strip() == "":
-        return "⚠️ Please describe your symptoms first.", "<p>No analysis data available</p>"
+        yield "⚠️ Please describe your symptoms first.", "<p>No analysis data available</p>", analysis
+        return
     
     # Prepare payload according to your models.py structure
     payload = {
@@ -192,57 +253,82 @@ def analyze_symptoms(symptoms, age, gender, lat, lon, city, country):
         }
     }
     
+    data = {}
+    errors = []
+    map_html = "<p>Looking for nearby hospitals...</p>"
+    yield "⏳ Analyzing symptoms...", map_html, analysis
     try:
-        # Call your /assist endpoint
-        response = requests.post(
-            f"{API_BASE}/assist", 
-            json=payload,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Store data for map functionality
-            last_analysis_data = data
+        # Call your /assist/stream endpoint
+        async with get_client().stream("POST", "/assist/stream", json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                yield f"❌ Analysis failed: {response.status_code} - {response.text}", "<p>Analysis failed</p>", analysis
+                return
             
-            # Generate formatted summary
-            summary = format_medical_assessment(data)
+            async for event, event_data in _sse_events(response):
+                if event == "done":
+                    break
+                if event == "error":
+                    errors.append(event_data.get("detail", "unknown error"))
+                    continue
+                if not _merge_event(data, event, event_data):
+                    continue
+                if event == "hospitals":
+                    map_html = generate_hospital_map_html(data["nearest_hospitals"])
+                if "severity" in data:
+                    yield format_medical_assessment(data, complete=False), map_html, analysis
             
-            # Generate hospital map HTML
-            hospitals = data.get('nearest_hospitals', [])
-            map_html = generate_hospital_map_html(hospitals)
-            
-            return summary, map_html
-        else:
-            return f"❌ Analysis failed: {response.status_code} - {response.text}", "<p>Analysis failed</p>"
-            
-    except requests.exceptions.ConnectionError:
-        return "❌ Cannot connect to medical analysis service. Please ensure the backend is running at http://127.0.0.1:8000", "<p>Connection failed</p>"
+    except httpx.ConnectError:
+        yield f"❌ Cannot connect to medical analysis service. Please ensure the backend is running at {API_BASE}", "<p>Connection failed</p>", analysis
+        return
     except Exception as e:
-        return f"❌ Error during analysis: {str(e)}", "<p>Error occurred</p>"
+        errors.append(str(e))
+    
+    if "severity" not in data:
+        yield f"❌ Error during analysis: {'; '.join(errors) or 'no assessment returned'}", "<p>Analysis failed</p>", analysis
+        return
+    
+    summary = format_medical_assessment(data)
+    if errors:
+        summary = f"⚠️ {'; '.join(errors)}\n\n" + summary
+    if not data.get("nearest_hospitals"):
+        map_html = generate_hospital_map_html(None)
+    # Store data for map functionality
+    yield summary, map_html, data
+
+def format_medical_assessment(data, complete=True):
+    """Format the medical assessment response from your backend.
 
-def format_medical_assessment(data):
-    """Format the medical assessment response from your backend"""
+    Works on partial data while a stream is still arriving; with
+    complete=False missing fields are shown as pending.
+    """
     summary = ""
     
     # Main assessment info
-    condition_type = data.get('condition_type', 'unknown').replace('_', ' ').title()
-    severity = data.get('severity', 'unknown').upper()
-    confidence = data.get('confidence', 0) * 100
+    condition_type = (data.get('condition_type') or ('unknown' if complete else '…')).replace('_', ' ').title()
+    severity = (data.get('severity') or 'unknown').upper()
+    confidence = data.get('confidence')
     
     # Header with severity-based styling
     if severity in ['HIGH', 'CRITICAL']:
         summary += f"🚨 **URGENT MEDICAL ASSESSMENT** 🚨\n\n"
     else:
         summary += f"🏥 **Medical Assessment Results**\n\n"
+    if data.get('provisional'):
+        if complete:
+            summary += "⚡ *Preliminary guidance from a red-flag check (the AI assessment was unavailable).*\n\n"
+        else:
+            summary += "⚡ *Preliminary guidance from a red-flag check; the full assessment is still coming.*\n\n"
     
     summary += f"**Condition Type:** {condition_type}\n"
     summary += f"**Severity Level:** {severity}\n"
-    summary += f"**AI Confidence:** {confidence:.1f}%\n\n"
+    if confidence is not None:
+        summary += f"**AI Confidence:** {confidence * 100:.1f}%\n\n"
+    else:
+        summary += "**AI Confidence:** …\n\n"
     
     # Red flags (critical warnings)
-    red_flags = data.get('red_flags', [])
+    red_flags = data.get('red_flags') or []
     if red_flags:
         summary += "⚠️ **Critical Warning Signs Detected:**\n"
         for flag in red_flags:
@@ -250,7 +336,7 @@ def format_medical_assessment(data):
         summary += "\n"
     
     # Recommended actions
-    actions = data.get('recommended_actions', [])
+    actions = data.get('recommended_actions') or []
     if actions:
         summary += "🚨 **Immediate Actions Required:**\n"
         for i, action in enumerate(actions, 1):
@@ -263,7 +349,7 @@ def format_medical_assessment(data):
         summary += f"🩹 **Self-Care Guidance:**\n{self_care}\n\n"
     
     # Nearest hospitals with enhanced mapping
-    hospitals = data.get('nearest_hospitals', [])
+    hospitals = data.get('nearest_hospitals') or []
     if hospitals:
         summary += "🏥 **Nearest Hospitals & Emergency Services:**\n\n"
         for i, hospital in enumerate(hospitals[:5], 1):  # Show top 5
@@ -335,6 +421,11 @@ def format_medical_assessment(data):
         summary += "• Consider urgent care if symptoms worsen\n"
         summary += "• Monitor symptoms closely\n\n"
     
+    if data.get('partial'):
+        summary += f"ℹ️ *Not available right now: {', '.join(data['partial'])}*\n\n"
+    if not complete:
+        summary += "⏳ *Still analyzing...*\n\n"
+    
     # Footer disclaimer
     summary += "---\n"
     summary += "💡 **Disclaimer:** This AI assessment provides guidance only and cannot replace professional medical advice. "
@@ -342,15 +433,15 @@ def format_medical_assessment(data):
     
     return summary
 
-def test_backend_connection():
+async def test_backend_connection():
     """Test if backend is accessible"""
     try:
-        response = requests.get(f"{API_BASE}/health", timeout=5)
+        response = await get_client().get("/health", timeout=5)
         if response.status_code == 200:
             return "✅ Backend connected successfully"
         else:
             return f"⚠️ Backend responded with status {response.status_code}"
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         return "❌ Cannot connect to backend. Please start your backend server first."
     except Exception as e:
         return f"❌ Connection test failed: {e}"
@@ -367,6 +458,9 @@ with gr.Blocks(title="AI LifeSaver Pro", theme=gr.themes.Soft()) as demo:
     </div>
     """)
     
+    # Per-session copy of the last /assist result (replaces a process-wide global)
+    analysis_state = gr.State({})
+    
     # Connection status
     with gr.Row():
         connection_status = gr.Textbox(
@@ -485,8 +579,8 @@ with gr.Blocks(title="AI LifeSaver Pro", theme=gr.themes.Soft()) as demo:
     # Event handlers
     analyze_btn.click(
         analyze_symptoms,
-        inputs=[symptoms, age, gender, lat, lon, city, country],
-        outputs=[output_text, map_info]
+        inputs=[symptoms, age, gender, lat, lon, city, country, analysis_state],
+        outputs=[output_text, map_info, analysis_state]
     )
     
     speak_btn.click(
@@ -496,8 +590,8 @@ with gr.Blocks(title="AI LifeSaver Pro", theme=gr.themes.Soft()) as demo:
     )
     
     clear_btn.click(
-        lambda: ("", None, "<p>Hospital locations will appear here after analysis</p>"),
-        outputs=[output_text, audio_out, map_info]
+        lambda: ("", None, "<p>Hospital locations will appear here after analysis</p>", {}),
+        outputs=[output_text, audio_out, map_info, analysis_state]
     )
     
     test_connection_btn.click(
@@ -541,9 +635,11 @@ with gr.Blocks(title="AI LifeSaver Pro", theme=gr.themes.Soft()) as demo:
         label="📚 Example Medical Cases"
     )
 
+demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_QUEUE_MAX)
+
 if __name__ == "__main__":
     print("🚀 Starting AI LifeSaver Pro...")
-    print("🔗 Backend should be running at: http://127.0.0.1:8000")
+    print(f"🔗 Backend should be running at: {API_BASE}")
     print("📝 Ready for medical emergency assessment!")
     
     demo.launch(